@@ -0,0 +1,58 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fake_spotify import start_server
+from spotify_enrichment import SpotifyAPI, SpotifyEnricher, RateLimiter
+
+# 🔹 Compare l'ancien schéma d'appels (lots de morceaux + un appel par artiste, en série)
+#    au moteur d'enrichissement (lots de morceaux et d'artistes en pipeline) sur le faux serveur
+
+
+def run_legacy(api, track_ids):
+    # Reproduit get_tracks_in_batches() + process_track() d'avant le moteur
+    artist_cache = {}
+    rows = 0
+    for i in range(0, len(track_ids), 50):
+        for track in api.tracks(track_ids[i:i + 50]):
+            artist_id = track["artists"][0]["id"]
+            if artist_id not in artist_cache:
+                artist_cache[artist_id] = api.get(f"artists/{artist_id}")
+            rows += 1
+    return rows
+
+
+def run_engine(api, track_ids, workers):
+    return len(SpotifyEnricher(api, workers=workers).enrich(track_ids))
+
+
+def measure(name, server, run):
+    api = SpotifyAPI("id", "secret", api_url=f"{server.url}/v1", token_url=f"{server.url}/api/token",
+                     limiter=RateLimiter(rate=1000, burst=1000))
+    start = time.perf_counter()
+    rows = run(api)
+    elapsed = time.perf_counter() - start
+    print(f"{name:>8} : {rows} lignes, {api.calls} appels ({api.calls / max(rows, 1):.3f} / ligne), "
+          f"{api.rate_limited} x 429, {api.server_errors} x 5xx, {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de l'enrichissement Spotify")
+    parser.add_argument("--tracks", type=int, default=2000)
+    parser.add_argument("--artists", type=int, default=600)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate-limit", type=int, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = start_server(latency=args.latency, rate_limit=args.rate_limit,
+                          error_rate=args.error_rate, n_artists=args.artists)
+    track_ids = [f"track{i}" for i in range(args.tracks)]
+
+    measure("legacy", server, lambda api: run_legacy(api, track_ids))
+    measure("engine", server, lambda api: run_engine(api, track_ids, args.workers))
+    server.shutdown()
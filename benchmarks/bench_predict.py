@@ -0,0 +1,104 @@
+import argparse
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import json
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DASHBOARD = os.path.join(ROOT, "spotify_dashboard")
+sys.path.insert(0, os.path.join(DASHBOARD, "backend"))
+sys.path.insert(0, ROOT)
+
+from load_test import percentile
+
+# 🔹 Latence de /api/predict sous charge concurrente : appel direct du modèle à chaque requête,
+#    micro-lots seuls, puis micro-lots + cache LRU (configuration servie par le dashboard)
+
+MODES = {
+    "direct": {"batching": False, "cache_size": 0},
+    "micro-lots": {"batching": True, "cache_size": 0},
+    "micro-lots+cache": {"batching": True, "cache_size": 4096},
+}
+
+
+def client(url, track_ids, bulk, deadline, latencies, lock, seed):
+    rng = random.Random(seed)
+    local = []
+    while time.perf_counter() < deadline:
+        # Popularité très inégale (loi de Pareto) : quelques morceaux concentrent les demandes
+        ids = [track_ids[min(int(rng.paretovariate(1.2)) - 1, len(track_ids) - 1)] for _ in range(bulk)]
+        body = json.dumps({"track_ids": ids}).encode()
+        request = urllib.request.Request(f"{url}/api/predict", data=body, headers={"Content-Type": "application/json"})
+        start = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+        local.append(time.perf_counter() - start)
+    with lock:
+        latencies.extend(local)
+
+
+def run_mode(app_module, predictor_class, url, track_ids, options, concurrency, bulk, duration):
+    predictor = predictor_class(app_module.CHARTS_DATA, app_module.HIT_MODEL_FILE, **options)
+    predictor.warm()
+    app_module.PREDICTOR = predictor
+
+    latencies, lock = [], threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=client, args=(url, track_ids, bulk, deadline, latencies, lock, seed))
+               for seed in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "requests": len(latencies),
+        "req_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+    if predictor.batcher is not None and predictor.batcher.batches:
+        result["requests_per_batch"] = round(predictor.batcher.batched_requests / predictor.batcher.batches, 1)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de l'endpoint /api/predict")
+    parser.add_argument("--concurrency", type=int, default=16, help="Clients simultanés")
+    parser.add_argument("--bulk", type=int, default=10, help="Morceaux par requête (résultats d'une recherche)")
+    parser.add_argument("--duration", type=float, default=10, help="Durée de chaque mesure (secondes)")
+    args = parser.parse_args()
+
+    # Le dashboard lit ses données en chemins relatifs depuis spotify_dashboard/
+    os.chdir(DASHBOARD)
+    os.environ.setdefault("CHARTS_POLL_INTERVAL", "0")
+    from werkzeug.serving import make_server
+    import app as app_module
+    from hit_model import train
+    from predictor import HitPredictor, charts_frame
+
+    app_module.CHARTS_DATA.load_all()
+    charts = charts_frame(app_module.CHARTS_DATA)
+    # Les workers ne font que lire le modèle : entraîné ici s'il n'existe pas encore
+    if not os.path.exists(app_module.HIT_MODEL_FILE):
+        train(charts, app_module.HIT_MODEL_FILE)
+    track_ids = charts["track_id"]
+    track_ids = track_ids.astype(str).value_counts().index.tolist()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+
+    print(f"⚙️ {args.concurrency} clients, {args.bulk} morceaux par requête, {args.duration:.0f} s par mode")
+    for name, options in MODES.items():
+        result = run_mode(app_module, HitPredictor, url, track_ids, options, args.concurrency, args.bulk, args.duration)
+        batch = f", {result['requests_per_batch']} requêtes / lot" if "requests_per_batch" in result else ""
+        print(f"{name:>17} : {result['req_per_s']} req/s, p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms{batch}")
+    server.shutdown()
@@ -0,0 +1,146 @@
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# 🔹 Faux serveur Spotify local : /api/token, /v1/tracks, /v1/artists
+#    avec latence, limite de débit (429 + Retry-After) et erreurs 5xx configurables
+
+
+def _stable_int(value):
+    return int(hashlib.md5(value.encode()).hexdigest()[:8], 16)
+
+
+def fake_track(track_id, n_artists):
+    seed = _stable_int(track_id)
+    return {
+        "id": track_id,
+        "popularity": seed % 100,
+        "duration_ms": 120000 + seed % 180000,
+        "explicit": bool(seed % 2),
+        "album": {
+            "images": [{"url": f"https://i.scdn.co/image/album-{track_id}"}],
+            "release_date": f"20{10 + seed % 15}-{1 + seed % 12:02d}-{1 + seed % 28:02d}",
+        },
+        "artists": [{"id": f"artist{seed % n_artists}"}],
+    }
+
+
+def fake_artist(artist_id):
+    seed = _stable_int(artist_id)
+    genres = ["pop", "rap", "afrobeats", "k-pop", "reggaeton", "christmas"]
+    return {
+        "id": artist_id,
+        "genres": [genres[seed % len(genres)]] if seed % 5 else [],
+        "images": [{"url": f"https://i.scdn.co/image/{artist_id}"}],
+        "followers": {"total": seed % 10_000_000},
+    }
+
+
+class FakeSpotifyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.02, rate_limit=None, retry_after=1, error_rate=0.0, n_artists=500):
+        super().__init__(address, FakeSpotifyHandler)
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.n_artists = n_artists
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.stats = {"tracks": 0, "artists": 0, "artist": 0, "token": 0, "429": 0, "5xx": 0}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    # Fenêtre fixe d'une seconde : au-delà de rate_limit requêtes -> 429
+    def over_limit(self):
+        if self.rate_limit is None:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 1:
+                self.window_start = now
+                self.window_count = 0
+            self.window_count += 1
+            return self.window_count > self.rate_limit
+
+
+class FakeSpotifyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        self.server.count("token")
+        self._send(200, {"access_token": "fake-token", "token_type": "Bearer", "expires_in": 3600})
+
+    def do_GET(self):
+        server = self.server
+        parsed = urlparse(self.path)
+        time.sleep(server.latency)
+
+        if server.over_limit():
+            server.count("429")
+            return self._send(429, {"error": "rate limited"}, {"Retry-After": str(server.retry_after)})
+        if server.error_rate and random.random() < server.error_rate:
+            server.count("5xx")
+            return self._send(503, {"error": "unavailable"})
+
+        ids = [i for i in parse_qs(parsed.query).get("ids", [""])[0].split(",") if i]
+        if parsed.path == "/v1/tracks":
+            server.count("tracks")
+            return self._send(200, {"tracks": [fake_track(i, server.n_artists) for i in ids]})
+        if parsed.path == "/v1/artists":
+            server.count("artists")
+            return self._send(200, {"artists": [fake_artist(i) for i in ids]})
+        if parsed.path.startswith("/v1/artists/"):
+            server.count("artist")
+            return self._send(200, fake_artist(parsed.path.rsplit("/", 1)[-1]))
+        self._send(404, {"error": "not found"})
+
+
+def start_server(port=0, **options):
+    server = FakeSpotifyServer(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Faux serveur Spotify pour les benchmarks")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--rate-limit", type=int, default=None, help="requêtes par seconde avant 429")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeSpotifyServer(("127.0.0.1", args.port), latency=args.latency,
+                               rate_limit=args.rate_limit, error_rate=args.error_rate)
+    print(f"🎧 Faux serveur Spotify sur {server.url}")
+    server.serve_forever()
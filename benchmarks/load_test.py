@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+import urllib.request
+from urllib.error import HTTPError
+
+# 🔹 Test de charge du dashboard : requêtes concurrentes sur les routes de l'API,
+#    débit, latences p50 / p99 et mémoire (RSS / PSS) de l'arbre de processus du serveur
+
+
+def fetch_json(url):
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def build_urls(base_url):
+    """Routes à solliciter : charts de chaque pays et quelques recherches"""
+    urls = []
+    for continent in fetch_json(f"{base_url}/api/continents"):
+        continent = urllib.parse.quote(continent)
+        for country in fetch_json(f"{base_url}/api/countries/{continent}"):
+            urls.append(f"{base_url}/api/charts/{continent}/{urllib.parse.quote(country['code'])}")
+    for query in ["love", "the", "bad", "taylor", "a"]:
+        urls.append(f"{base_url}/api/search?query={query}")
+    return urls
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def process_tree(pid):
+    """Le processus et tous ses descendants (maître gunicorn + workers)"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+def memory_usage(pid):
+    """RSS et PSS cumulés (Mo) ; le PSS répartit les pages partagées entre les processus qui les utilisent"""
+    rss = pss = 0
+    for process in process_tree(pid):
+        try:
+            with open(f'/proc/{process}/smaps_rollup') as f:
+                for line in f:
+                    if line.startswith('Rss:'):
+                        rss += int(line.split()[1])
+                    elif line.startswith('Pss:'):
+                        pss += int(line.split()[1])
+        except OSError:
+            continue
+    return rss / 1024, pss / 1024
+
+
+def worker(urls, deadline, latencies, errors, lock):
+    local_latencies, local_errors = [], 0
+    while time.perf_counter() < deadline:
+        url = random.choice(urls)
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                response.read()
+        except HTTPError as e:
+            if e.code >= 500:
+                local_errors += 1
+        except OSError:
+            local_errors += 1
+        local_latencies.append(time.perf_counter() - start)
+    with lock:
+        latencies.extend(local_latencies)
+        errors.append(local_errors)
+
+
+def run(base_url, concurrency, duration, server_pid=None):
+    urls = build_urls(base_url)
+    # Premier passage : chaque worker charge ses données, on ne mesure que le régime établi
+    for url in urls:
+        fetch_json(url)
+
+    latencies, errors, lock = [], [], threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=worker, args=(urls, deadline, latencies, errors, lock))
+               for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "req_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+    if server_pid:
+        rss, pss = memory_usage(server_pid)
+        result.update({"processes": len(process_tree(server_pid)), "rss_mb": round(rss, 1), "pss_mb": round(pss, 1)})
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test de charge de l'API du dashboard")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Adresse du serveur")
+    parser.add_argument("--concurrency", type=int, default=16, help="Clients simultanés")
+    parser.add_argument("--duration", type=float, default=20, help="Durée de la mesure (secondes)")
+    parser.add_argument("--pid", type=int, help="PID du serveur (maître gunicorn) pour mesurer la mémoire")
+    args = parser.parse_args()
+
+    result = run(args.url.rstrip("/"), args.concurrency, args.duration, args.pid)
+    print(f"🚀 {result['requests']} requêtes ({result['errors']} erreurs) : {result['req_per_s']} req/s, "
+          f"p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms")
+    if "rss_mb" in result:
+        print(f"💾 {result['processes']} processus : RSS {result['rss_mb']} Mo, PSS {result['pss_mb']} Mo")
@@ -0,0 +1,272 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "spotify_dashboard", "backend"))
+
+from synthetic_charts import generate, SCALES
+from fake_spotify import start_server
+from load_test import percentile
+import metrics
+
+# 🔹 Suite de benchmarks : ingestion (merge_files), enrichissement (faux serveur Spotify),
+#    analyse (predict_popularity) et routes du dashboard, sur des charts synthétiques à 1x / 10x / 100x.
+#    Chaque échelle tourne dans son propre processus (état des modules et pic RSS indépendants),
+#    les résultats sont écrits en JSON pour comparer deux commits (--compare).
+
+
+def measure(func, setup=None, memory=True):
+    """Durée d'un appel, puis pic d'allocations (tracemalloc) sur un second appel identique"""
+    args = setup() if setup else ()
+    # Sorties des scripts (print, barres tqdm) masquées pendant les mesures
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        start = time.perf_counter()
+        result = func(*args)
+        seconds = time.perf_counter() - start
+
+        stats = {"seconds": round(seconds, 4)}
+        if memory:
+            args = setup() if setup else ()
+            tracemalloc.start()
+            func(*args)
+            stats["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 2)
+            tracemalloc.stop()
+    return result, stats
+
+
+def measure_route(client, urls, memory=True):
+    """Latences d'une route (le premier appel à part : caches et index encore vides)"""
+    latencies = []
+    if memory:
+        tracemalloc.start()
+    for url in urls:
+        start = time.perf_counter()
+        response = client.get(url)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, (url, response.status_code)
+    stats = {
+        "requests": len(urls),
+        "first_ms": round(latencies[0] * 1000, 3),
+        "p50_ms": round(percentile(latencies[1:] or latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies[1:] or latencies, 99) * 1000, 3),
+    }
+    if memory:
+        stats["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 2)
+        tracemalloc.stop()
+    return stats
+
+
+def run_scale(scale, workdir, latency, memory, requests):
+    """Toutes les étapes pour une échelle, dans workdir (cwd des scripts du dépôt)"""
+    stages = {}
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+
+    start = time.perf_counter()
+    countries, weeks, files = generate(workdir, scale)
+    dataset = {"scale": scale, "countries": countries, "weeks": weeks, "files": files,
+               "generate_seconds": round(time.perf_counter() - start, 2)}
+
+    # 🔹 Ingestion
+    import merge_files
+    (final_df, all_data), stages["merge_all_countries"] = measure(
+        lambda: merge_files.merge_all_countries("Charts_World"), memory=memory)
+    # Fusion en flux écrite dans un dossier à part, pour ne pas laisser de store partiel au dashboard
+    os.makedirs("stream", exist_ok=True)
+    os.chdir("stream")
+    _, stages["stream_all_countries"] = measure(
+        lambda: merge_files.stream_all_countries(os.path.join("..", "Charts_World")), memory=memory)
+    os.chdir("..")
+    shutil.rmtree("stream")
+    cleaned, stages["clean_data"] = measure(merge_files.clean_data, setup=lambda: (final_df.copy(),), memory=memory)
+    dataset["rows"] = len(cleaned)
+    dataset["tracks"] = int(cleaned["track_id"].nunique())
+
+    # 🔹 Enrichissement contre le faux serveur (métadonnées repartant d'un store vide à chaque mesure)
+    server = start_server(latency=latency)
+    os.environ.update({"SPOTIFY_API_URL": f"{server.url}/v1", "SPOTIFY_TOKEN_URL": f"{server.url}/api/token",
+                       "CLIENT_ID": "bench", "CLIENT_SECRET": "bench"})
+    import get_infos_tracks
+    from metadata_store import MetadataStore
+    from spotify_enrichment import SpotifyEnricher
+
+    def fresh_enricher():
+        get_infos_tracks.enricher = SpotifyEnricher(get_infos_tracks.get_api(), workers=8, store=MetadataStore(":memory:"))
+        return (cleaned["track_id"].unique(),)
+
+    df_spotify, stages["get_tracks_info"] = measure(get_infos_tracks.get_tracks_info, setup=fresh_enricher, memory=memory)
+    stages["get_tracks_info"]["api_calls"] = dict(server.stats)
+    server.shutdown()
+
+    # Arborescence Charts_with_info (format lu par predict_popularity et le dashboard sans store)
+    with_info_files = []
+    for merged_data, continent, country_code, flag in all_data:
+        country_df = merge_files.clean_data(merged_data.copy()).merge(df_spotify, on="track_id", how="left")
+        path = os.path.join("Charts_with_info", continent, f"charts_{country_code}{flag}.csv")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        country_df.to_csv(path, index=False)
+        with_info_files.append(path)
+
+    # 🔹 Analyse : premier appel (construction du moteur) puis appels suivants
+    import predict_popularity
+    top = cleaned.iloc[0]
+    query = (top["track_name"], top["artist_names"])
+
+    def cold_engine():
+        predict_popularity._engines.clear()
+        return (with_info_files, *query)
+
+    _, stages["analyze_popularity"] = measure(predict_popularity.analyze_popularity, setup=cold_engine, memory=memory)
+    _, stages["analyze_popularity_cached"] = measure(
+        lambda: [predict_popularity.analyze_popularity(with_info_files, *query) for _ in range(20)], memory=memory)
+    stages["analyze_popularity_cached"]["calls"] = 20
+
+    # 🔹 Dashboard : chargement complet puis chaque route via le client de test Flask
+    os.makedirs("spotify_dashboard", exist_ok=True)
+    os.chdir("spotify_dashboard")
+    os.environ.update({"CHARTS_POLL_INTERVAL": "0", "WARM_INDEXES": "0"})
+    import app as dashboard
+    from aggregates import ChartAggregates
+
+    _, stages["load_all_data"] = measure(dashboard.load_all_data, memory=memory)
+    dashboard.CHARTS_DATA.load_all()
+    dashboard.CHART_AGGREGATES = ChartAggregates(dashboard.CHARTS_DATA)
+    client = dashboard.app.test_client()
+
+    chart_urls = [f"/api/charts/{continent.replace('Charts_', '')}/{country_key}"
+                  for continent, countries in dashboard.CHARTS_DATA.items() for country_key in countries]
+    continents = [continent.replace('Charts_', '') for continent in dashboard.CHARTS_DATA]
+    search_terms = ["track g1", "artist", "g00", "label", top["track_name"][:6].lower()]
+    routes = {
+        "/api/search": [f"/api/search?query={search_terms[i % len(search_terms)]}" for i in range(requests)],
+        "/api/charts (froid)": chart_urls,
+        "/api/charts": [chart_urls[i % len(chart_urls)] for i in range(requests)],
+        "/api/continents": ["/api/continents"] * requests,
+        "/api/world": [f"/api/world?limit={10 + i % 3}" for i in range(requests)],
+        "/api/charts/<continent>": [f"/api/charts/{continents[i % len(continents)]}" for i in range(requests)],
+    }
+    for name, urls in routes.items():
+        stages[f"route {name}"] = measure_route(client, urls, memory=memory)
+
+    dataset["max_rss_mb"] = metrics.peak_rss_mb()
+    return {"dataset": dataset, "stages": stages}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def metadata():
+    import numpy
+    import pandas
+    return {
+        "commit": git_commit(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "cpus": os.cpu_count(),
+        "platform": platform.platform(),
+    }
+
+
+def print_scale(scale, result):
+    dataset = result["dataset"]
+    print(f"📊 Échelle {scale}x : {dataset['countries']} pays, {dataset['weeks']} semaines, {dataset['rows']} lignes, "
+          f"{dataset['tracks']} morceaux (RSS max {dataset['max_rss_mb']} Mo)")
+    for name, stats in result["stages"].items():
+        timing = f"{stats['seconds']:.3f} s" if "seconds" in stats else f"p50 {stats['p50_ms']} ms, p99 {stats['p99_ms']} ms"
+        peak = f", pic {stats['peak_mb']} Mo" if "peak_mb" in stats else ""
+        print(f"   {name:<30} {timing}{peak}")
+
+
+# 🔹 Comparaison de deux fichiers de résultats : ratio nouveau / ancien par étape
+def compare(old_file, new_file, threshold=0.10):
+    with open(old_file, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_file, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"🔍 {old['meta']['commit']} -> {new['meta']['commit']}")
+    regressions = 0
+    for scale, result in new["scales"].items():
+        if scale not in old["scales"]:
+            continue
+        print(f"📊 Échelle {scale}x")
+        for name, stats in result["stages"].items():
+            before = old["scales"][scale]["stages"].get(name)
+            if not before:
+                continue
+            for metric in ["seconds", "p50_ms", "p99_ms", "peak_mb"]:
+                if metric in stats and before.get(metric):
+                    ratio = stats[metric] / before[metric]
+                    flag = "⚠️" if ratio > 1 + threshold else "  "
+                    regressions += ratio > 1 + threshold
+                    print(f" {flag} {name:<30} {metric:<8} {before[metric]:>10} -> {stats[metric]:>10} (x{ratio:.2f})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Suite de benchmarks du pipeline et du dashboard")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1], choices=sorted(SCALES),
+                        help="échelles des charts synthétiques (pays x semaines)")
+    parser.add_argument("--latency", type=float, default=0.0, help="latence du faux serveur Spotify (s)")
+    parser.add_argument("--requests", type=int, default=200, help="requêtes par route du dashboard")
+    parser.add_argument("--no-memory", action="store_true", help="sans mesure du pic mémoire (tracemalloc)")
+    parser.add_argument("--workdir", help="dossier de travail (temporaire et supprimé par défaut)")
+    parser.add_argument("--output", help="fichier JSON des résultats (défaut : benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("ANCIEN", "NOUVEAU"), help="compare deux fichiers de résultats")
+    parser.add_argument("--run-scale", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare) else 0)
+
+    if args.run_scale:
+        # Processus enfant : une seule échelle, résultat écrit dans --output
+        result = run_scale(args.run_scale, args.workdir, args.latency, not args.no_memory, args.requests)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        sys.exit(0)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="spotify_bench_")
+    results = {"meta": metadata(), "scales": {}}
+    try:
+        for scale in args.scales:
+            scale_dir = os.path.join(workdir, f"scale_{scale}")
+            part = os.path.join(workdir, f"scale_{scale}.json")
+            command = [sys.executable, os.path.abspath(__file__), "--run-scale", str(scale), "--workdir", scale_dir,
+                       "--output", part, "--latency", str(args.latency), "--requests", str(args.requests)]
+            if args.no_memory:
+                command.append("--no-memory")
+            subprocess.run(command, check=True)
+            with open(part, encoding="utf-8") as f:
+                results["scales"][str(scale)] = json.load(f)
+            print_scale(scale, results["scales"][str(scale)])
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"✅ Résultats enregistrés dans {output}")
@@ -0,0 +1,133 @@
+import argparse
+import csv
+import datetime
+import itertools
+import os
+import numpy as np
+import pandas as pd
+
+# 🔹 Générateur de charts synthétiques au format de Charts_World :
+#    Charts_World/Charts_<Continent>/Charts_<CODE><drapeau>/regional-<code>-weekly-<AAAA-MM-JJ>.csv
+#    (200 lignes par semaine, mêmes colonnes et mêmes guillemets que les exports Spotify)
+
+# Pays réels du dépôt, dupliqués (codes AAA, AAB, ...) pour les échelles supérieures
+COUNTRIES = {
+    "Charts_North_America": {"CAN": "🇨🇦", "USA": "🇺🇸", "MEX": "🇲🇽"},
+    "Charts_Asia": {"ARE": "🇦🇪", "IDN": "🇮🇩", "IND": "🇮🇳", "JPN": "🇯🇵", "KOR": "🇰🇷", "SAU": "🇸🇦",
+                    "THA": "🇹🇭", "TUR": "🇹🇷"},
+    "Charts_Europe": {"BEL": "🇧🇪", "DNK": "🇩🇰", "ESP": "🇪🇸", "FIN": "🇫🇮", "FRA": "🇫🇷", "GBR": "🇬🇧",
+                      "ITA": "🇮🇹", "NOR": "🇳🇴"},
+    "Charts_Oceania": {"AUS": "🇦🇺", "NZL": "🇳🇿"},
+    "Charts_South_America": {"ARG": "🇦🇷", "BOL": "🇧🇴", "BRA": "🇧🇷", "CHL": "🇨🇱", "COL": "🇨🇴", "VEN": "🇻🇪"},
+    "Charts_Africa": {"EGY": "🇪🇬", "MAR": "🇲🇦", "NGA": "🇳🇬", "ZAF": "🇿🇦"},
+}
+
+BASE_WEEKS = 53
+CHART_SIZE = 200
+FIRST_WEEK = datetime.date(2025, 1, 30)
+
+# 🔹 Échelle -> (multiplicateur du nombre de pays, multiplicateur du nombre de semaines)
+SCALES = {1: (1, 1), 10: (10, 1), 100: (10, 10)}
+
+GLOBAL_TRACKS = 3000
+LOCAL_TRACKS = 300
+CSV_COLUMNS = ["rank", "uri", "artist_names", "track_name", "source", "peak_rank", "previous_rank",
+               "weeks_on_chart", "streams"]
+
+
+def _codes():
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    return ("".join(code) for code in itertools.product(letters, repeat=3))
+
+
+def country_list(country_factor):
+    """[(continent, code, drapeau)] : les 31 pays réels puis des copies aux codes synthétiques"""
+    countries = [(continent, code, flag) for continent, codes in COUNTRIES.items() for code, flag in codes.items()]
+    real_codes = {code for _, code, _ in countries}
+    synthetic = (code for code in _codes() if code not in real_codes)
+    result = list(countries)
+    for _ in range(country_factor - 1):
+        result += [(continent, next(synthetic), flag) for continent, _, flag in countries]
+    return result
+
+
+def _track_pool(rng, prefix, size, n_weeks):
+    ids = [f"{prefix}{i:06d}".ljust(22, "x") for i in range(size)]
+    return pd.DataFrame({
+        "track_id": ids,
+        "track_name": [f"Track {prefix}{i}" for i in range(size)],
+        "artist_names": [f"Artist {prefix}{i % max(size // 3, 1)}" for i in range(size)],
+        "source": [f"Label {i % 40}" for i in range(size)],
+        # Popularité de base très inégale, date de sortie et durée de vie en semaines
+        "weight": rng.pareto(1.5, size) + 0.05,
+        "release": rng.integers(-20, n_weeks, size),
+        "lifetime": rng.uniform(2, 25, size),
+    })
+
+
+def generate_country(rng, global_pool, local_pool, n_weeks, audience):
+    """Semaines d'un pays, de la plus ancienne à la plus récente, avec peak / previous / weeks_on_chart suivis"""
+    pool = pd.concat([global_pool, local_pool], ignore_index=True)
+    uris = ("spotify:track:" + pool["track_id"]).to_numpy()
+    names, artists, sources = (pool[c].to_numpy() for c in ["track_name", "artist_names", "source"])
+    base = pool["weight"].to_numpy() * rng.lognormal(0, 0.6, len(pool))
+    release, lifetime = pool["release"].to_numpy(), pool["lifetime"].to_numpy()
+
+    weeks_on_chart = np.zeros(len(pool), dtype=int)
+    peak_rank = np.full(len(pool), CHART_SIZE + 1)
+    previous_rank = np.full(len(pool), -1)
+    ranks = np.arange(1, CHART_SIZE + 1)
+
+    for week in range(n_weeks):
+        age = week - release
+        weights = np.where(age >= 0, base * np.exp(-np.maximum(age, 0) / lifetime), 0)
+        # Tirage sans remise pondéré (Gumbel top-k) : les 200 meilleures clés forment le classement
+        keys = np.log(weights + 1e-12) + rng.gumbel(size=len(pool))
+        top = np.argpartition(-keys, CHART_SIZE)[:CHART_SIZE]
+        top = top[np.argsort(-keys[top])]
+
+        previous = previous_rank[top]
+        weeks_on_chart[top] += 1
+        peak_rank[top] = np.minimum(peak_rank[top], ranks)
+        previous_rank[:] = -1
+        previous_rank[top] = ranks
+
+        streams = (audience * 3_000_000 / ranks ** 0.8 * rng.uniform(0.9, 1.1, CHART_SIZE)).astype(int)
+        yield week, zip(ranks.tolist(), uris[top], artists[top], names[top], sources[top], peak_rank[top].tolist(),
+                        previous.tolist(), weeks_on_chart[top].tolist(), streams.astype(str))
+
+
+def generate(output_dir, scale=1, seed=42):
+    """Écrit l'arborescence Charts_World synthétique ; retourne (nombre de pays, de semaines, de fichiers)"""
+    country_factor, week_factor = SCALES[scale]
+    n_weeks = BASE_WEEKS * week_factor
+    rng = np.random.default_rng(seed)
+    global_pool = _track_pool(rng, "G", GLOBAL_TRACKS * country_factor, n_weeks)
+
+    files = 0
+    countries = country_list(country_factor)
+    for continent, code, flag in countries:
+        country_folder = os.path.join(output_dir, "Charts_World", continent, f"Charts_{code}{flag}")
+        os.makedirs(country_folder, exist_ok=True)
+        local_pool = _track_pool(rng, code, LOCAL_TRACKS, n_weeks)
+        audience = rng.lognormal(0, 0.8)
+        for week, rows in generate_country(rng, global_pool, local_pool, n_weeks, audience):
+            week_date = FIRST_WEEK - datetime.timedelta(weeks=n_weeks - 1 - week)
+            path = os.path.join(country_folder, f"regional-{code.lower()}-weekly-{week_date.isoformat()}.csv")
+            # Comme les exports Spotify : BOM, textes et streams entre guillemets
+            with open(path, "w", encoding="utf-8-sig", newline="") as f:
+                f.write(",".join(CSV_COLUMNS) + "\r\n")
+                csv.writer(f, quoting=csv.QUOTE_NONNUMERIC, lineterminator="\r\n").writerows(rows)
+            files += 1
+    return len(countries), n_weeks, files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère des charts hebdomadaires synthétiques")
+    parser.add_argument("output_dir", help="dossier de sortie (Charts_World y est créé)")
+    parser.add_argument("--scale", type=int, default=1, choices=sorted(SCALES))
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    countries, weeks, files = generate(args.output_dir, args.scale, args.seed)
+    print(f"✅ {countries} pays x {weeks} semaines : {files} fichiers dans {args.output_dir}/Charts_World")
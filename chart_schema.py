@@ -0,0 +1,125 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+# 🔹 Schéma typé des charts : texte répété en catégories, entiers compacts, vraies dates et booléens.
+#    Un même morceau revient des dizaines de semaines dans 31 pays : en catégories, chaque valeur
+#    distincte n'est stockée qu'une fois et les lignes ne gardent qu'un code entier.
+
+# Catégories triées (astype("category")) : tri et groupby donnent le même ordre que sur les chaînes
+CATEGORY_COLUMNS = [
+    "uri", "artist_names", "track_name", "source", "track_id", "genre",
+    "release_date", "track_image", "artist_image", "continent", "country",
+]
+
+# Type le plus petit attendu ; élargi automatiquement si les valeurs ne tiennent pas
+INTEGER_COLUMNS = {
+    "rank": "int16",
+    "peak_rank": "int16",
+    "previous_rank": "int16",
+    "weeks_on_chart": "int16",
+    "streams": "int32",
+    "popularity": "int8",
+    "duration_ms": "int32",
+}
+
+DATETIME_COLUMNS = ["week_date"]
+BOOL_COLUMNS = ["explicit"]
+
+INTEGER_CANDIDATES = ["int8", "int16", "int32", "int64"]
+
+
+def _integer_dtype(values, dtype):
+    if values.empty:
+        return dtype
+    low, high = values.min(), values.max()
+    for candidate in INTEGER_CANDIDATES[INTEGER_CANDIDATES.index(dtype):]:
+        info = np.iinfo(candidate)
+        if info.min <= low and high <= info.max:
+            return candidate
+    return "int64"
+
+
+def _compact_integer(series, dtype):
+    values = pd.to_numeric(series, errors="coerce")
+    dtype = _integer_dtype(values, dtype)
+    if values.isna().any():
+        # Valeurs manquantes (ex. previous_rank d'une nouvelle entrée) : entier nullable (Int16, Int32, ...),
+        # un flottant 32 bits arrondirait les grands nombres de streams
+        return values.astype(dtype.capitalize())
+    return values.astype(dtype)
+
+
+def _compact_bool(series):
+    if series.dtype == bool:
+        return series
+    values = series.map({True: True, False: False, "True": True, "False": False, "true": True, "false": False})
+    return values.astype(bool) if values.notna().all() else values.astype("boolean")
+
+
+# 🔹 Applique le schéma aux colonnes présentes (les autres sont laissées telles quelles).
+#    Une colonne déjà au bon type n'est pas recopiée (utile pour les colonnes projetées en mémoire).
+def compact(df):
+    df = df.copy(deep=False)
+    for column in df.columns:
+        dtype = df[column].dtype
+        if column in CATEGORY_COLUMNS and not isinstance(dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+        elif column in INTEGER_COLUMNS and dtype.kind not in "iu":
+            df[column] = _compact_integer(df[column], INTEGER_COLUMNS[column])
+        elif column in INTEGER_COLUMNS and dtype.itemsize > np.dtype(INTEGER_COLUMNS[column]).itemsize:
+            df[column] = _compact_integer(df[column], INTEGER_COLUMNS[column])
+        elif column in DATETIME_COLUMNS and dtype.kind != "M":
+            df[column] = pd.to_datetime(df[column], format="%Y-%m-%d")
+        elif column in BOOL_COLUMNS:
+            df[column] = _compact_bool(df[column])
+    return df
+
+
+# 🔹 Lecture d'un CSV de charts directement au schéma compact
+def read_charts_csv(path, **kwargs):
+    return compact(pd.read_csv(path, **kwargs))
+
+
+def memory_mb(df):
+    return df.memory_usage(index=True, deep=True).sum() / 1024 ** 2
+
+
+# 🔹 Mémoire par colonne avant / après compaction
+def memory_report(before, after):
+    report = pd.DataFrame({
+        "dtype_before": before.dtypes.astype(str),
+        "dtype_after": after.dtypes.reindex(before.columns).astype(str),
+        "mb_before": before.memory_usage(index=False, deep=True) / 1024 ** 2,
+        "mb_after": after.memory_usage(index=False, deep=True).reindex(before.columns) / 1024 ** 2,
+    })
+    report["ratio"] = report["mb_before"] / report["mb_after"]
+    return report.round(2)
+
+
+def print_memory_report(before, after):
+    print(memory_report(before, after).to_string())
+    total_before, total_after = memory_mb(before), memory_mb(after)
+    print(f"💾 Total : {total_before:.1f} Mo -> {total_after:.1f} Mo (x{total_before / total_after:.1f})")
+
+
+if __name__ == "__main__":
+    import time
+    import chart_store
+
+    parser = argparse.ArgumentParser(description="Mémoire des charts avant / après le schéma compact")
+    parser.add_argument("--dataset", default="with_info", choices=sorted(chart_store.CSV_TREES))
+    args = parser.parse_args()
+
+    # Référence : les colonnes texte telles que lues dans les CSV (objets Python)
+    raw = chart_store.load_charts(args.dataset)
+    raw = raw.astype({column: object for column in raw.columns if isinstance(raw[column].dtype, pd.CategoricalDtype)})
+    compacted = compact(raw)
+    print_memory_report(raw, compacted)
+
+    for name, df in [("objets", raw), ("compact", compacted)]:
+        start = time.perf_counter()
+        for _ in range(5):
+            df.groupby(["country", "track_id"], observed=True)["streams"].sum()
+            df.groupby("week_date")["popularity"].mean()
+        print(f"⏱️ groupby ({name}) : {(time.perf_counter() - start) / 5 * 1000:.1f} ms")
@@ -0,0 +1,307 @@
+import pandas as pd
+import os
+import re
+import json
+import shutil
+import operator
+import pyarrow.parquet as pq
+
+# 🔹 Dossier du stockage colonnaire (Parquet partitionné par continent / pays,
+#    trié par semaine pour que les statistiques des row groups filtrent sur week_date)
+STORE_DIR = "Charts_store"
+
+# 🔹 Arborescences CSV d'origine pour chaque jeu de données (utilisées en secours si le store n'existe pas)
+CSV_TREES = {
+    "no_info": "Charts_no_info",
+    "with_info": "Charts_with_info",
+}
+
+PARTITION_COLS = ["continent", "country"]
+ROW_GROUP_SIZE = 500
+
+# 🔹 Colonnes texte très répétées, stockées en dictionnaire (catégories)
+DICTIONARY_COLUMNS = ["artist_names", "genre", "track_image", "artist_image"]
+
+COUNTRIES_FILE = "_countries.json"
+
+# 🔹 Table de dimension des morceaux : une ligne par track_id avec les métadonnées Spotify
+#    (et celles du premier artiste), jointe à la demande aux positions hebdomadaires du dataset
+#    "no_info" qui sert de table de faits
+TRACKS_FILE = "tracks.parquet"
+FACTS_DATASET = "no_info"
+
+FILTER_OPS = {
+    "==": operator.eq, "=": operator.eq, "!=": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "in": lambda s, v: s.isin(v), "not in": lambda s, v: ~s.isin(v),
+}
+
+
+# 🔹 "FRA🇫🇷" -> ("FRA", "🇫🇷")
+def split_country_flag(name):
+    match = re.match(r"([A-Za-z]+)([\U0001F1E6-\U0001F1FF]*)", name)
+    if match:
+        return match.group(1).upper(), match.group(2)
+    return name, ""
+
+
+# 🔹 Les arborescences CSV sont rangées à côté du store
+def csv_tree(dataset, store_dir=STORE_DIR):
+    return os.path.join(os.path.dirname(os.path.normpath(store_dir)), CSV_TREES[dataset])
+
+
+def dataset_path(dataset, store_dir=STORE_DIR):
+    return os.path.join(store_dir, dataset)
+
+
+def store_exists(dataset, store_dir=STORE_DIR):
+    return os.path.exists(os.path.join(dataset_path(dataset, store_dir), COUNTRIES_FILE))
+
+
+def _read_countries(dataset, store_dir=STORE_DIR):
+    path = os.path.join(dataset_path(dataset, store_dir), COUNTRIES_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_countries(countries, dataset, store_dir=STORE_DIR):
+    path = os.path.join(dataset_path(dataset, store_dir), COUNTRIES_FILE)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(countries, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+# 🔹 Écriture (ou remplacement) de la partition d'un pays
+def write_country(df, dataset, continent, country, flag="", store_dir=STORE_DIR):
+    country, parsed_flag = split_country_flag(country)
+    flag = flag or parsed_flag
+
+    country_dir = os.path.join(dataset_path(dataset, store_dir), f"continent={continent}", f"country={country}")
+    if os.path.exists(country_dir):
+        shutil.rmtree(country_dir)
+    os.makedirs(country_dir)
+
+    df = df.copy()
+    df["continent"] = continent
+    df["country"] = country
+    df["week_date"] = pd.to_datetime(df["week_date"]).dt.strftime("%Y-%m-%d")
+    df = df.sort_values(["week_date", "rank"], ascending=[False, True], kind="stable")
+    for column in DICTIONARY_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+
+    df.to_parquet(dataset_path(dataset, store_dir), engine="pyarrow", partition_cols=PARTITION_COLS,
+                  index=False, row_group_size=ROW_GROUP_SIZE)
+
+    countries = _read_countries(dataset, store_dir)
+    countries.setdefault(continent, {})[country] = flag
+    _write_countries(countries, dataset, store_dir)
+
+
+# 🔹 Liste des pays disponibles : {continent: {pays: drapeau}}
+def list_countries(dataset, store_dir=STORE_DIR):
+    if store_exists(dataset, store_dir):
+        return _read_countries(dataset, store_dir)
+
+    countries = {}
+    tree = csv_tree(dataset, store_dir)
+    for continent in sorted(os.listdir(tree)):
+        continent_path = os.path.join(tree, continent)
+        if os.path.isdir(continent_path):
+            for file in sorted(os.listdir(continent_path)):
+                if file.endswith(".csv"):
+                    country, flag = split_country_flag(file.split("_")[-1].replace(".csv", ""))
+                    countries.setdefault(continent, {})[country] = flag
+    return countries
+
+
+def _apply_filters(df, filters):
+    for column, op, value in filters:
+        df = df[FILTER_OPS[op](df[column], value)]
+    return df
+
+
+def _partition_matches(filters, continent, country):
+    partition = {"continent": continent, "country": country}
+    for column, op, value in filters:
+        if column in partition and not FILTER_OPS[op](pd.Series([partition[column]]), value).iloc[0]:
+            return False
+    return True
+
+
+# 🔹 Lecture de secours depuis l'arborescence CSV (même API que le store)
+def _load_from_csv_tree(dataset, columns, filters, store_dir):
+    tree = csv_tree(dataset, store_dir)
+    frames = []
+    for continent, countries in list_countries(dataset, store_dir).items():
+        for country, flag in countries.items():
+            if not _partition_matches(filters, continent, country):
+                continue
+            df = pd.read_csv(os.path.join(tree, continent, f"charts_{country}{flag}.csv"))
+            df["continent"] = continent
+            df["country"] = country
+            df = _apply_filters(df, filters)
+            frames.append(df[columns] if columns else df)
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+# 🔹 Chargement avec projection de colonnes et filtres poussés jusqu'au Parquet
+#    filters : liste de tuples (colonne, opérateur, valeur), ex. [("country", "==", "FRA")]
+def load_charts(dataset, columns=None, filters=None, store_dir=STORE_DIR):
+    filters = filters or []
+    if not store_exists(dataset, store_dir):
+        return _load_from_csv_tree(dataset, columns, filters, store_dir)
+
+    df = pd.read_parquet(dataset_path(dataset, store_dir), engine="pyarrow",
+                         columns=columns, filters=filters or None)
+
+    # Les clés de partition reviennent en catégories : on les remet en texte comme dans les CSV
+    for column in PARTITION_COLS:
+        if column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(str)
+
+    # Même ordre que clean_data() : semaine décroissante puis rang
+    if "week_date" in df.columns and "rank" in df.columns:
+        df = df.sort_values(["week_date", "rank"], ascending=[False, True], kind="stable", ignore_index=True)
+    return df
+
+
+def country_path(dataset, continent, country, store_dir=STORE_DIR):
+    country, _ = split_country_flag(country)
+    return os.path.join(dataset_path(dataset, store_dir), f"continent={continent}", f"country={country}")
+
+
+# 🔹 Lecture directe de la partition d'un pays (sans découvrir tout le dataset)
+def load_country(dataset, continent, country, columns=None, store_dir=STORE_DIR):
+    country, _ = split_country_flag(country)
+    if not store_exists(dataset, store_dir):
+        filters = [("continent", "==", continent), ("country", "==", country)]
+        return _load_from_csv_tree(dataset, columns, filters, store_dir)
+
+    file_columns = [c for c in columns if c not in PARTITION_COLS] if columns else None
+    df = pd.read_parquet(country_path(dataset, continent, country, store_dir), engine="pyarrow", columns=file_columns)
+    if columns is None or "continent" in columns:
+        df["continent"] = continent
+    if columns is None or "country" in columns:
+        df["country"] = country
+    # Déjà trié à l'écriture (semaine décroissante puis rang)
+    return df[columns] if columns else df
+
+
+def tracks_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, TRACKS_FILE)
+
+
+def tracks_exist(store_dir=STORE_DIR):
+    return os.path.exists(tracks_path(store_dir))
+
+
+def track_columns(store_dir=STORE_DIR):
+    return pq.read_schema(tracks_path(store_dir)).names
+
+
+def load_tracks(columns=None, store_dir=STORE_DIR):
+    return pd.read_parquet(tracks_path(store_dir), engine="pyarrow", columns=columns)
+
+
+# 🔹 Ajout / mise à jour de métadonnées : une seule écriture rafraîchit tous les pays
+def write_tracks(tracks, store_dir=STORE_DIR):
+    if tracks_exist(store_dir):
+        tracks = pd.concat([load_tracks(store_dir=store_dir), tracks], ignore_index=True)
+    tracks = tracks.drop_duplicates("track_id", keep="last").sort_values("track_id", ignore_index=True)
+
+    os.makedirs(store_dir, exist_ok=True)
+    tmp_path = f"{tracks_path(store_dir)}.tmp"
+    tracks.to_parquet(tmp_path, engine="pyarrow", index=False)
+    os.replace(tmp_path, tracks_path(store_dir))
+    return len(tracks)
+
+
+def _split_columns(columns, dimension_columns):
+    """Colonnes demandées -> (colonnes des faits, colonnes de la dimension) ; track_id sert à la jointure"""
+    if columns is None:
+        return None, None
+    dimension = [c for c in columns if c in dimension_columns and c != "track_id"]
+    facts = [c for c in columns if c not in dimension]
+    if dimension and "track_id" not in facts:
+        facts.append("track_id")
+    return facts, ["track_id"] + dimension
+
+
+# 🔹 Positions hebdomadaires + métadonnées des morceaux (jointure gauche, l'ordre des faits est conservé)
+def join_tracks(facts, tracks, columns=None):
+    df = facts.merge(tracks, on="track_id", how="left", sort=False) if len(tracks.columns) > 1 else facts
+    return df[columns] if columns else df
+
+
+def _load_enriched(load_facts, columns, filters, store_dir):
+    dimension_columns = set(track_columns(store_dir))
+    fact_columns, tracks_columns = _split_columns(columns, dimension_columns)
+    fact_filters = [f for f in filters if f[0] not in dimension_columns or f[0] == "track_id"]
+    dimension_filters = [f for f in filters if f not in fact_filters]
+    if dimension_filters and fact_columns is not None:
+        fact_columns, tracks_columns = _split_columns(
+            list(dict.fromkeys(columns + [f[0] for f in dimension_filters])), dimension_columns)
+
+    df = join_tracks(load_facts(fact_columns, fact_filters), load_tracks(tracks_columns, store_dir))
+    df = _apply_filters(df, dimension_filters).reset_index(drop=True)
+    if columns:
+        return df[columns]
+    # Même ordre de colonnes que "with_info" : clés de partition en dernier
+    return df[[c for c in df.columns if c not in PARTITION_COLS] + [c for c in PARTITION_COLS if c in df.columns]]
+
+
+# 🔹 Charts enrichis : jointure faits + dimension si la table des morceaux existe,
+#    sinon l'ancien dataset dénormalisé "with_info"
+def load_enriched(columns=None, filters=None, store_dir=STORE_DIR):
+    filters = filters or []
+    if not tracks_exist(store_dir):
+        return load_charts("with_info", columns, filters, store_dir)
+    return _load_enriched(lambda c, f: load_charts(FACTS_DATASET, c, f, store_dir), columns, filters, store_dir)
+
+
+def load_enriched_country(continent, country, columns=None, store_dir=STORE_DIR):
+    if not tracks_exist(store_dir):
+        return load_country("with_info", continent, country, columns, store_dir)
+    return _load_enriched(lambda c, f: _apply_filters(load_country(FACTS_DATASET, continent, country, c, store_dir), f),
+                          columns, [], store_dir)
+
+
+# 🔹 Pays disponibles avec métadonnées (mêmes clés que list_countries)
+def list_enriched_countries(store_dir=STORE_DIR):
+    return list_countries(FACTS_DATASET if tracks_exist(store_dir) else "with_info", store_dir)
+
+
+# 🔹 Construction de la dimension depuis les charts enrichis existants (la semaine la plus récente gagne)
+def build_tracks(store_dir=STORE_DIR):
+    facts_columns = set(pq.ParquetDataset(dataset_path(FACTS_DATASET, store_dir)).schema.names)
+    enriched = load_charts("with_info", store_dir=store_dir)
+    columns = ["track_id"] + [c for c in enriched.columns if c not in facts_columns]
+    tracks = enriched.sort_values("week_date", ascending=False, kind="stable").drop_duplicates("track_id")[columns]
+    count = write_tracks(tracks, store_dir)
+    print(f"🎵 Dimension des morceaux : {count} morceaux dans {tracks_path(store_dir)}")
+
+
+# 🔹 Conversion des arborescences CSV existantes vers le store
+def build_store(datasets=("no_info", "with_info"), store_dir=STORE_DIR):
+    for dataset in datasets:
+        tree = csv_tree(dataset, store_dir)
+        print(f"📦 Conversion de {tree} vers {dataset_path(dataset, store_dir)}")
+        for continent in sorted(os.listdir(tree)):
+            continent_path = os.path.join(tree, continent)
+            if not os.path.isdir(continent_path):
+                continue
+            for file in sorted(os.listdir(continent_path)):
+                if file.endswith(".csv"):
+                    country, flag = split_country_flag(file.split("_")[-1].replace(".csv", ""))
+                    df = pd.read_csv(os.path.join(continent_path, file))
+                    write_country(df, dataset, continent, country, flag, store_dir)
+                    print(f"    ✅ {continent} / {country}{flag}")
+
+
+if __name__ == "__main__":
+    build_store()
+    build_tracks()
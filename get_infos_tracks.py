@@ -1,35 +1,59 @@
 import pandas as pd
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-from tqdm import tqdm
 import os
-import time
-import pickle
-import concurrent.futures
+import argparse
 from dotenv import load_dotenv
+import chart_store
+import metrics
+from spotify_enrichment import SpotifyAPI, SpotifyEnricher, API_URL, TOKEN_URL
+from metadata_store import MetadataStore, METADATA_DB
+from run_journal import RunJournal, JOURNAL_DB, frame_hash
 
 # 🔹 Chargement des variables d'environnement
 load_dotenv()
 
-# 🔹 Connexion à l'API Spotify
-client_id = os.getenv("CLIENT_ID")
-client_secret = os.getenv("CLIENT_SECRET")
-sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(client_id=client_id, client_secret=client_secret))
-
-# 🔹 Cache pour stocker les résultats et éviter les appels répétés
+# 🔹 Métadonnées en SQLite (WAL) avec TTL ; l'ancien cache pickle est migré une seule fois
 CACHE_FILE = "spotify_cache.pkl"
-track_info_cache = {}
-artist_info_cache = {}
 
-def save_cache():
-    with open(CACHE_FILE, "wb") as f:
-        pickle.dump((track_info_cache, artist_info_cache), f)
+# 🔹 Client API, store, moteur d'enrichissement et journal sont créés au premier usage :
+#    importer le module (benchmarks, dashboard) ne crée ni base SQLite ni migration dans le dossier courant
+api = None
+store = None
+enricher = None
+journal = None
 
-def load_cache():
-    global track_info_cache, artist_info_cache
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, "rb") as f:
-            track_info_cache, artist_info_cache = pickle.load(f)
+# 🔹 Connexion à l'API Spotify
+#    SPOTIFY_API_URL / SPOTIFY_TOKEN_URL permettent de viser un faux serveur local (benchmarks/fake_spotify.py)
+def get_api():
+    global api
+    if api is None:
+        api = SpotifyAPI(os.getenv("CLIENT_ID"), os.getenv("CLIENT_SECRET"),
+                         api_url=os.getenv("SPOTIFY_API_URL", API_URL),
+                         token_url=os.getenv("SPOTIFY_TOKEN_URL", TOKEN_URL))
+    return api
+
+def get_store():
+    global store
+    if store is None:
+        store = MetadataStore(METADATA_DB)
+        if store.count("tracks") == 0:
+            store.migrate_from_pickle(CACHE_FILE)
+    return store
+
+# 🔹 Moteur d'enrichissement : lots de 50 morceaux puis de 50 artistes, limiteur de débit partagé
+def get_enricher():
+    global enricher
+    if enricher is None:
+        enricher = SpotifyEnricher(get_api(), workers=8, store=get_store())
+    return enricher
+
+# 🔹 Journal des runs : un run relancé saute les fichiers à jour et reprend au lot près
+def get_journal():
+    global journal
+    if journal is None:
+        journal = RunJournal(JOURNAL_DB)
+    return journal
+
+JOURNAL_BATCH_SIZE = 500
 
 # 🔹 Extraction automatique du **continent** et du **pays** à partir du chemin du fichier
 def extract_continent_and_country(file_path):
@@ -41,129 +65,119 @@ def extract_continent_and_country(file_path):
         return continent, country
     return None, None
 
-# 🔹 Récupération des morceaux en batchs (50 par requête)
-def get_tracks_in_batches(batch_ids):
-    while True:
-        try:
-            return sp.tracks(batch_ids)["tracks"]
-        except spotipy.exceptions.SpotifyException as e:
-            if e.http_status == 429:
-                retry_after = int(e.headers.get("Retry-After", 5))
-                print(f"⚠️ Rate limit atteint. Pause de {retry_after} secondes...")
-                time.sleep(retry_after)
-            else:
-                print(f"⚠️ Erreur API : {e}")
-                return []
-
-# 🔹 Récupération des infos des morceaux
-def process_track(track, artist_name):
-    if not track:
-        return None
-    try:
-        track_id = track["id"]
-        artist_id = track["artists"][0]["id"] if track["artists"] else None
-
-        # 🔹 Vérifie si l'info est déjà en cache
-        if track_id in track_info_cache:
-            return track_info_cache[track_id]
-
-        # 🔹 Récupération des infos de l'artiste
-        if artist_id in artist_info_cache:
-            artist_info = artist_info_cache[artist_id]
-        else:
-            artist_info = sp.artist(artist_id) if artist_id else {"genres": [], "images": []}
-            artist_info_cache[artist_id] = artist_info
-
-        # 🔹 Nombre d'auditeurs mensuels (followers)
-        monthly_listeners = artist_info["followers"]["total"]
-
-        # 🔹 Récupération des images
-        track_image = track["album"]["images"][0]["url"] if track["album"]["images"] else None
-        artist_image = artist_info["images"][0]["url"] if artist_info["images"] else None
-
-        track_info = {
-            "track_id": track_id,
-            "popularity": track["popularity"],
-            "duration_ms": track["duration_ms"],
-            "explicit": track["explicit"],
-            "genre": artist_info["genres"][0] if artist_info["genres"] else None,
-            "release_date": track["album"]["release_date"],
-            "track_image": track_image,
-            "artist_image": artist_image,
-            "monthly_listeners": monthly_listeners
-        }
-
-        # 🔹 Ajoute au cache
-        track_info_cache[track_id] = track_info
-        return track_info
-
-    except Exception as e:
-        print(f"⚠️ Erreur lors du traitement d'un morceau : {e}")
-        return None
-
 # 🔹 Récupère les informations pour plusieurs morceaux
-def get_tracks_info(track_ids, artist_names):
-    track_data = []
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        futures = []
-        for i in range(0, len(track_ids), 50):
-            batch_ids = track_ids[i:i+50]
-            futures.append(executor.submit(get_tracks_in_batches, batch_ids))
-
-        for future in tqdm(concurrent.futures.as_completed(futures), total=len(futures), desc="🔍 Récupération des morceaux"):
-            tracks = future.result()
-            for track, artist_name in zip(tracks, artist_names[i:i+50]):
-                track_info = process_track(track, artist_name)
-                if track_info:
-                    track_data.append(track_info)
+#    Avec input_hash, chaque lot de JOURNAL_BATCH_SIZE morceaux terminé est noté dans le journal
+def get_tracks_info(track_ids, artist_names=None, input_hash=None):
+    enricher = get_enricher()
+    if input_hash is None:
+        return enricher.enrich(track_ids)
+
+    journal = get_journal()
+    track_ids = list(track_ids)
+    done = journal.completed_batches(input_hash)
+    for index, start in enumerate(range(0, len(track_ids), JOURNAL_BATCH_SIZE)):
+        if index in done:
+            continue
+        batch = track_ids[start:start + JOURNAL_BATCH_SIZE]
+        # Un lot incomplet (erreurs API, artistes non lus) n'est pas noté : il sera repris au prochain run
+        if len(enricher.enrich(batch)) == len(set(batch)):
+            journal.mark_batch_done(input_hash, index)
 
-    return pd.DataFrame(track_data)
+    infos = enricher.store.get_tracks(track_ids, fresh_only=False)
+    return pd.DataFrame([infos[track_id] for track_id in track_ids if track_id in infos])
 
 # 🔹 Enrichissement des fichiers CSV
-def enrich_multiple_csv_with_spotify_data(input_files, output_base_folder):
-    if not os.path.exists(output_base_folder):
-        os.makedirs(output_base_folder)
-
+#    Les positions hebdomadaires (table de faits "no_info") et les métadonnées des morceaux
+#    (dimension unique, jointe sur track_id) sont stockées séparément ; denormalized=True écrit
+#    en plus l'ancien CSV enrichi par pays pour les outils qui lisent encore Charts_with_info.
+#    La dimension est réécrite une seule fois en fin de run, avec les morceaux de tous les fichiers
+def enrich_multiple_csv_with_spotify_data(input_files, output_base_folder, denormalized=False):
+    store, journal = get_store(), get_journal()
+    pending_tracks, pending_files = [], []
     for input_file in input_files:
         continent, country = extract_continent_and_country(input_file)
         if not continent or not country:
             print(f"❌ Impossible d'extraire les informations du fichier {input_file}")
             continue
 
-        # 🔹 Création des dossiers automatiquement
-        output_folder = os.path.join(output_base_folder, continent)
-        if not os.path.exists(output_folder):
-            os.makedirs(output_folder)
-
-        output_file = os.path.join(output_folder, f"charts_{country}.csv")
+        output_file = os.path.join(output_base_folder, continent, f"charts_{country}.csv")
         print(f"📥 Traitement du fichier : {input_file}")
 
-        df = pd.read_csv(input_file)
+        # 🔹 Lecture depuis le store colonnaire si le pays y est, sinon depuis le CSV
+        facts_partition = chart_store.country_path(chart_store.FACTS_DATASET, continent, country)
+        if os.path.isdir(facts_partition):
+            df = chart_store.load_country(chart_store.FACTS_DATASET, continent, country)
+            df = df.drop(columns=["continent"])
+        else:
+            df = pd.read_csv(input_file)
 
         if 'track_id' not in df.columns or 'artist_names' not in df.columns:
             print(f"❌ Colonnes manquantes dans {input_file}")
             continue
 
+        # 🔹 Fichier déjà enrichi avec exactement la même entrée : rien à refaire
+        input_key = f"{continent}/{country}"
+        input_hash = frame_hash(df)
+        done_output = output_file if denormalized else chart_store.tracks_path()
+        if journal.is_file_done(input_key, input_hash) and os.path.exists(done_output):
+            print(f"⏭️ {input_key} est déjà à jour")
+            continue
+
         track_ids = df["track_id"].unique()
-        artist_names = df["artist_names"].tolist()
 
-        print(f"🔍 Récupération des données Spotify pour {len(track_ids)} morceaux...")
+        # 🔹 Toutes les métadonnées sont en cache et valides : seule l'écriture est nécessaire
+        if len(store.get_tracks(track_ids)) == len(track_ids):
+            print(f"⚡ Métadonnées déjà en cache pour les {len(track_ids)} morceaux")
+        else:
+            print(f"🔍 Récupération des données Spotify pour {len(track_ids)} morceaux...")
 
-        df_spotify = get_tracks_info(track_ids, artist_names)
+        with metrics.timer("pipeline_stage_seconds", stage="enrich"):
+            df_spotify = get_tracks_info(track_ids, input_hash=input_hash)
         if df_spotify.empty:
             print(f"❌ Échec de récupération des données pour {input_file}.")
             continue
 
-        df_merged = df.merge(df_spotify, on="track_id", how="left")
-        df_merged.to_csv(output_file, index=False)
-        print(f"✅ Fichier enrichi {output_file} créé avec succès !")
+        # 🔹 Une ligne par morceau dans la dimension, au lieu d'une par semaine et par pays
+        pending_tracks.append(df_spotify)
+        if not os.path.isdir(facts_partition):
+            with metrics.timer("pipeline_stage_seconds", stage="write"):
+                chart_store.write_country(df, chart_store.FACTS_DATASET, continent, country)
+
+        if denormalized:
+            with metrics.timer("pipeline_stage_seconds", stage="merge"):
+                df_merged = df.merge(df_spotify, on="track_id", how="left")
+            with metrics.timer("pipeline_stage_seconds", stage="write"):
+                os.makedirs(os.path.dirname(output_file), exist_ok=True)
+                df_merged.to_csv(output_file, index=False)
+                chart_store.write_country(df_merged, "with_info", continent, country)
+            print(f"✅ Fichier enrichi {output_file} créé avec succès !")
+
+        # 🔹 Morceaux manquants (lots en échec) : le fichier reste à reprendre, ses lots terminés restent notés
+        if len(df_spotify) < len(track_ids):
+            print(f"⚠️ {len(track_ids) - len(df_spotify)} morceaux de {input_key} sans métadonnées : repris au prochain run")
+            continue
+        pending_files.append((input_key, input_hash, done_output))
+
+    if not pending_tracks:
+        return
 
-        # 🔹 Sauvegarde du cache après chaque fichier
-        save_cache()
+    with metrics.timer("pipeline_stage_seconds", stage="write"):
+        count = chart_store.write_tracks(pd.concat(pending_tracks, ignore_index=True))
+    # 🔹 Fichiers notés terminés seulement une fois la dimension écrite : un run interrompu les reprendra
+    for input_key, input_hash, done_output in pending_files:
+        journal.mark_file_done(input_key, input_hash, done_output)
+    print(f"✅ Métadonnées de {len(pending_files)} fichiers enregistrées ({count} morceaux dans {chart_store.tracks_path()})")
 
 # 🔹 Exemple d'utilisation
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enrichissement des charts avec les métadonnées Spotify")
+    parser.add_argument("--with-info", action="store_true",
+                        help="écrit aussi les CSV dénormalisés de Charts_with_info")
+    parser.add_argument("--report", help="écrit le rapport JSON des métriques du run dans ce fichier")
+    parser.add_argument("--profile", help="écrit les piles du profileur (METRICS_PROFILE) dans ce fichier")
+    args = parser.parse_args()
+    metrics.start_profiler_from_env()
+
     input_files = [
         "Charts_no_info/Charts_North_America/charts_CAN🇨🇦.csv",
         "Charts_no_info/Charts_North_America/charts_USA🇺🇸.csv",
@@ -203,5 +217,5 @@ if __name__ == "__main__":
         "Charts_no_info/Charts_Africa/charts_ZAF🇿🇦.csv",
     ]
     output_folder = "Charts_with_info"
-    load_cache()
-    enrich_multiple_csv_with_spotify_data(input_files, output_folder)
+    enrich_multiple_csv_with_spotify_data(input_files, output_folder, denormalized=args.with_info)
+    metrics.finish_run(args.report, args.profile)
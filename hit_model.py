@@ -0,0 +1,286 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from popularity_engine import PopularityEngine
+
+# 🔹 Modèle de prédiction des hits internationaux : régression logistique entraînée sur des
+#    indicateurs calculés sur les premières semaines de classement d'un morceau
+
+MODEL_FILE = "hit_model.json"
+
+# 🔹 Fenêtre d'observation : les EARLY_WEEKS premières semaines après la première apparition mondiale
+EARLY_WEEKS = 3
+# 🔹 Genres encodés individuellement (les autres sont regroupés dans "other")
+TOP_GENRES = 15
+
+NUMERIC_FEATURES = [
+    "best_rank", "rank_velocity", "countries", "continents", "spread_lag_days", "log_streams",
+    "log_monthly_listeners", "popularity", "duration_min", "explicit", "release_age_days",
+]
+
+TRACK_COLUMNS = ["popularity", "duration_ms", "explicit", "genre", "release_date", "monthly_listeners"]
+
+
+def _sigmoid(z):
+    return 1 / (1 + np.exp(-np.clip(z, -30, 30)))
+
+
+def roc_auc(y, scores):
+    """Aire sous la courbe ROC (statistique de Mann-Whitney)"""
+    y = np.asarray(y, dtype=bool)
+    positives, negatives = y.sum(), (~y).sum()
+    if positives == 0 or negatives == 0:
+        return float("nan")
+    ranks = pd.Series(scores).rank().to_numpy()
+    return float((ranks[y].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+
+
+class HitFeatures:
+    """Indicateurs par morceau, calculés par groupby sur les lignes des premières semaines.
+
+    Les lignes utiles (fenêtre de début de carrière) sont isolées une seule fois : construire
+    les indicateurs d'une semaine de charts ne touche plus que quelques milliers de lignes.
+    """
+
+    def __init__(self, charts):
+        charts = charts[["track_id", "track_name", "artist_names", "country", "continent", "week_date",
+                         "rank", "streams"] + [c for c in TRACK_COLUMNS if c in charts.columns]].copy()
+        charts["track_id"] = charts["track_id"].astype(str)
+        charts["week"] = pd.to_datetime(charts["week_date"])
+        charts["first_seen"] = charts.groupby("track_id")["week"].transform("min")
+
+        # Première semaine du morceau dans chaque pays (décalage de propagation)
+        charts["country_first_seen"] = charts.groupby(["track_id", "country"], observed=True)["week"].transform("min")
+        since_first = (charts["week"] - charts["first_seen"]).dt.days
+        self.early = charts[since_first < EARLY_WEEKS * 7].sort_values(["track_id", "country", "week"], kind="stable")
+        self.weeks = charts.drop_duplicates(["week", "track_id"])[["week", "track_id"]]
+
+        # Attributs fixes du morceau (dimension) : la ligne la plus récente, quel que soit l'ordre reçu
+        tracks = charts.sort_values("week", ascending=False, kind="stable").drop_duplicates("track_id").set_index("track_id")
+        self.tracks = tracks.reindex(columns=["track_name", "artist_names", "first_seen"] + TRACK_COLUMNS)
+
+        # Indicateurs qui ne dépendent pas de la date d'observation, calculés une seule fois
+        tracks = self.tracks
+        release = pd.to_datetime(tracks["release_date"], format="mixed", errors="coerce")
+        self.static = pd.DataFrame({
+            "log_monthly_listeners": np.log1p(pd.to_numeric(tracks["monthly_listeners"], errors="coerce")),
+            "popularity": pd.to_numeric(tracks["popularity"], errors="coerce"),
+            "duration_min": pd.to_numeric(tracks["duration_ms"], errors="coerce") / 60000,
+            "explicit": tracks["explicit"].map({True: 1.0, False: 0.0, "True": 1.0, "False": 0.0}).astype(float),
+            "release_age_days": (tracks["first_seen"] - release).dt.days,
+            "genre": tracks["genre"].astype(object).fillna("unknown").astype(str),
+        })
+
+    @classmethod
+    def from_store(cls):
+        return cls(PopularityEngine.from_store().charts)
+
+    def tracks_of_week(self, week_date):
+        week = pd.to_datetime(week_date)
+        return self.weeks.loc[self.weeks["week"] == week, "track_id"].to_numpy()
+
+    def build(self, track_ids=None, as_of=None):
+        """Indicateurs bruts par morceau ; as_of limite aux semaines déjà connues à cette date"""
+        early = self.early
+        if track_ids is not None:
+            early = early[early["track_id"].isin(track_ids)]
+        if as_of is not None:
+            early = early[early["week"] <= pd.to_datetime(as_of)]
+
+        per_country = early.groupby(["track_id", "country"], observed=True, sort=False).agg(
+            first_rank=("rank", "first"), last_rank=("rank", "last"), weeks=("week", "size"),
+            lag=("country_first_seen", "first"), first_seen=("first_seen", "first"))
+        # Vitesse : places gagnées par semaine dans chaque pays, moyenne sur les pays
+        per_country["velocity"] = (per_country["first_rank"] - per_country["last_rank"]) / (per_country["weeks"] - 1).clip(lower=1)
+        per_country["lag_days"] = (per_country["lag"] - per_country["first_seen"]).dt.days
+
+        by_track = per_country.groupby(level="track_id", sort=False)
+        early_tracks = early.groupby("track_id", sort=False)
+        features = pd.DataFrame({
+            "best_rank": early_tracks["rank"].min(),
+            "rank_velocity": by_track["velocity"].mean(),
+            "countries": by_track.size(),
+            "continents": early_tracks["continent"].nunique(),
+            "spread_lag_days": by_track["lag_days"].mean(),
+            "log_streams": np.log1p(early_tracks["streams"].max()),
+        })
+
+        return features.join(self.static, how="left")
+
+
+def hit_labels(charts):
+    """Étiquette : le morceau est un hit international selon la règle de PopularityEngine"""
+    return PopularityEngine(charts).classify_tracks()["is_international"]
+
+
+class HitModel:
+    """Régression logistique régularisée (Newton / IRLS en numpy) sur indicateurs standardisés"""
+
+    def __init__(self, genres=(), means=None, stds=None, weights=None, l2=1.0):
+        self.genres = list(genres)
+        self.means = means
+        self.stds = stds
+        self.weights = weights
+        self.l2 = l2
+
+    @property
+    def feature_names(self):
+        return NUMERIC_FEATURES + [f"genre={genre}" for genre in self.genres + ["other"]]
+
+    def _matrix(self, features):
+        numeric = features[NUMERIC_FEATURES].to_numpy(dtype=float, na_value=np.nan)
+        genres = features["genre"].where(features["genre"].isin(self.genres), "other")
+        one_hot = (genres.to_numpy()[:, None] == np.array(self.genres + ["other"], dtype=object)[None, :]).astype(float)
+        return numeric, one_hot
+
+    def _standardized(self, features):
+        numeric, one_hot = self._matrix(features)
+        # Valeurs manquantes remplacées par la moyenne d'entraînement (0 une fois standardisées)
+        numeric = np.where(np.isnan(numeric), self.means, numeric)
+        return np.c_[np.ones(len(numeric)), (numeric - self.means) / self.stds, one_hot]
+
+    def fit(self, features, labels, iterations=50):
+        labels = labels.reindex(features.index).fillna(False).to_numpy(dtype=float)
+        self.genres = features["genre"][features["genre"] != "unknown"].value_counts().index[:TOP_GENRES].tolist()
+
+        # Colonne entièrement vide (ex. monthly_listeners absent des anciens charts) : moyenne 0, écart 1
+        numeric = features[NUMERIC_FEATURES].astype(float)
+        self.means = numeric.mean().fillna(0).to_numpy()
+        stds = numeric.std(ddof=0).fillna(0).to_numpy()
+        self.stds = np.where(stds == 0, 1.0, stds)
+        X = self._standardized(features)
+
+        # Classes pondérées : les hits internationaux sont rares
+        positives = max(labels.sum(), 1)
+        sample_weights = np.where(labels == 1, len(labels) / (2 * positives), len(labels) / (2 * max(len(labels) - positives, 1)))
+
+        penalty = np.full(X.shape[1], self.l2)
+        penalty[0] = 0
+        weights = np.zeros(X.shape[1])
+        for _ in range(iterations):
+            p = _sigmoid(X @ weights)
+            gradient = X.T @ (sample_weights * (p - labels)) + penalty * weights
+            hessian = (X * (sample_weights * p * (1 - p))[:, None]).T @ X + np.diag(penalty + 1e-9)
+            step = np.linalg.solve(hessian, gradient)
+            weights -= step
+            if np.abs(step).max() < 1e-6:
+                break
+        self.weights = weights
+        return self
+
+    def predict_proba(self, features):
+        if features.empty:
+            return pd.Series(dtype=float, index=features.index)
+        return pd.Series(_sigmoid(self._standardized(features) @ self.weights), index=features.index)
+
+    def to_dict(self):
+        return {
+            "early_weeks": EARLY_WEEKS,
+            "numeric_features": NUMERIC_FEATURES,
+            "genres": self.genres,
+            "means": self.means.tolist(),
+            "stds": self.stds.tolist(),
+            "weights": self.weights.tolist(),
+            "l2": self.l2,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["genres"], np.array(data["means"]), np.array(data["stds"]), np.array(data["weights"]), data["l2"])
+
+    def save(self, model_file=MODEL_FILE):
+        # Écriture atomique : un processus qui charge le modèle ne lit jamais un fichier à moitié écrit
+        tmp_path = f"{model_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, model_file)
+
+    @classmethod
+    def load(cls, model_file=MODEL_FILE):
+        with open(model_file, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+# 🔹 Entraînement : les morceaux apparus avant la date de coupure servent à l'apprentissage,
+#    les plus récents à l'évaluation (pas de fuite d'information du futur vers le passé)
+def train(charts=None, model_file=MODEL_FILE, test_fraction=0.25):
+    if charts is None:
+        charts = PopularityEngine.from_store().charts
+    start = time.perf_counter()
+    hit_features = HitFeatures(charts)
+    features = hit_features.build()
+    labels = hit_labels(charts).reindex(features.index).fillna(False)
+    feature_time = time.perf_counter() - start
+
+    first_seen = hit_features.tracks["first_seen"].reindex(features.index)
+    cutoff = first_seen.quantile(1 - test_fraction)
+    train_mask = (first_seen < cutoff).to_numpy()
+
+    model = HitModel().fit(features[train_mask], labels[train_mask])
+    scores = model.predict_proba(features[~train_mask])
+    test_labels = labels[~train_mask].to_numpy(dtype=bool)
+    metrics = {
+        "tracks": len(features),
+        "train_tracks": int(train_mask.sum()),
+        "test_tracks": int((~train_mask).sum()),
+        "hits": int(labels.sum()),
+        "test_auc": roc_auc(test_labels, scores.to_numpy()),
+        "test_accuracy": float(((scores.to_numpy() >= 0.5) == test_labels).mean()) if len(test_labels) else float("nan"),
+        "feature_seconds": round(feature_time, 3),
+    }
+
+    # Modèle final entraîné sur tous les morceaux, mis en cache sur disque
+    model = HitModel().fit(features, labels)
+    model.save(model_file)
+    return model, metrics
+
+
+_models = {}
+
+def load_model(model_file=MODEL_FILE):
+    """Modèle en cache (mémoire puis disque) ; entraîné s'il n'existe pas encore"""
+    if model_file not in _models:
+        if os.path.exists(model_file):
+            _models[model_file] = HitModel.load(model_file)
+        else:
+            _models[model_file] = train(model_file=model_file)[0]
+    return _models[model_file]
+
+
+# 🔹 Probabilité de devenir un hit international pour chaque morceau classé une semaine donnée,
+#    avec les seules données connues à cette date
+def score_week(week_date, hit_features, model=None):
+    model = model or load_model()
+    track_ids = hit_features.tracks_of_week(week_date)
+    features = hit_features.build(track_ids, as_of=week_date)
+    scores = features[[]].assign(
+        track_name=hit_features.tracks["track_name"].reindex(features.index).astype(str),
+        artist_names=hit_features.tracks["artist_names"].reindex(features.index).astype(str),
+        hit_probability=model.predict_proba(features),
+    )
+    return scores.sort_values("hit_probability", ascending=False).reset_index()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entraînement et prédiction des hits internationaux")
+    parser.add_argument("--train", action="store_true", help="réentraîne le modèle et l'enregistre")
+    parser.add_argument("--week", help="semaine à évaluer (AAAA-MM-JJ), par défaut la plus récente")
+    parser.add_argument("--model", default=MODEL_FILE, help="fichier du modèle")
+    args = parser.parse_args()
+
+    if args.train or not os.path.exists(args.model):
+        model, metrics = train(model_file=args.model)
+        print(f"✅ Modèle enregistré dans {args.model}")
+        print(f"📊 {metrics['train_tracks']} morceaux d'entraînement, {metrics['test_tracks']} de test, "
+              f"{metrics['hits']} hits : AUC {metrics['test_auc']:.3f}, précision {metrics['test_accuracy']:.3f}")
+
+    hit_features = HitFeatures.from_store()
+    week = args.week or hit_features.weeks["week"].max().strftime("%Y-%m-%d")
+    start = time.perf_counter()
+    scores = score_week(week, hit_features, load_model(args.model))
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"🔮 Semaine {week} : {len(scores)} morceaux évalués en {elapsed:.1f} ms")
+    print(scores.head(10).to_string(index=False))
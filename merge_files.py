@@ -1,9 +1,23 @@
 import pandas as pd
 import os
 import re
+import json
+import hashlib
+import time
+import argparse
+import concurrent.futures
+from collections import defaultdict
+import chart_store
+import chart_schema
+import metrics
 
 BASE_DIR = "Charts_World"
 OUTPUT_DIR = "Charts_no_info"
+MANIFEST_DIR = os.path.join(OUTPUT_DIR, ".manifests")
+
+# 🔹 Colonnes lues par la fusion en flux (previous_rank est supprimée par clean_data, on ne la lit pas)
+STREAM_COLUMNS = ['rank', 'uri', 'artist_names', 'track_name', 'source', 'streams', 'peak_rank', 'weeks_on_chart']
+TOP_RANK = 50
 
 if not os.path.exists(OUTPUT_DIR):
     os.makedirs(OUTPUT_DIR)
@@ -18,52 +32,67 @@ def extract_week_date(filename):
     match = re.search(r'(\d{4}-\d{2}-\d{2})', filename)
     return match.group(1) if match else None
 
-def extract_track_id(uri):
-    return uri.split(':')[-1] if pd.notnull(uri) else None
-
 def list_csv_files(folder_path):
     all_files = [f for f in os.listdir(folder_path) if f.endswith(".csv")]
     all_files.sort(reverse=True, key=lambda x: extract_week_date(x))
     return all_files
 
 def process_file(file_path, country_code):
-    df = pd.read_csv(file_path)
+    with metrics.timer("pipeline_stage_seconds", stage="parse"):
+        df = pd.read_csv(file_path)
+    metrics.inc("pipeline_files_total", country=country_code)
 
-    # 🔹 On garde uniquement les 50 premières places
-    df = df[df['rank'] <= 50]
+    with metrics.timer("pipeline_stage_seconds", stage="filter"):
+        # 🔹 On garde uniquement les 50 premières places
+        df = df[df['rank'] <= 50]
 
-    df = df[['rank', 'uri', 'artist_names', 'track_name', 'source', 'streams', 'peak_rank', 'previous_rank', 'weeks_on_chart']]
-    df['country'] = country_code
-    df['week_date'] = extract_week_date(file_path)
-    df['track_id'] = df['uri'].apply(extract_track_id)
+        df = df[['rank', 'uri', 'artist_names', 'track_name', 'source', 'streams', 'peak_rank', 'previous_rank', 'weeks_on_chart']]
+        df['country'] = country_code
+        df['week_date'] = extract_week_date(file_path)
+        # 🔹 Extraction vectorisée de l'identifiant (spotify:track:<id>)
+        df['track_id'] = df['uri'].str.rsplit(':', n=1).str[-1]
     return df
 
 def merge_csv_files_from_folder(folder_path, country_code):
     all_files = list_csv_files(folder_path)
     df_list = [process_file(os.path.join(folder_path, file), country_code) for file in all_files]
-    return pd.concat(df_list, ignore_index=True)
-
-def merge_all_countries(base_folder):
-    all_data = []
-    country_info_list = []
+    with metrics.timer("pipeline_stage_seconds", stage="concat"):
+        return pd.concat(df_list, ignore_index=True)
 
+def list_country_folders(base_folder):
+    tasks = []
     for continent in os.listdir(base_folder):
         continent_path = os.path.join(base_folder, continent)
         if os.path.isdir(continent_path):
             print(f"📂 Traitement du continent : {continent}")
-
             for country_folder in os.listdir(continent_path):
                 country_path = os.path.join(continent_path, country_folder)
-
                 if os.path.isdir(country_path):
-                    print(f"    🌍 Fusion des fichiers pour : {country_folder}")
+                    tasks.append((country_path, continent, country_folder))
+    return tasks
+
+def merge_country(country_path, continent, country_folder):
+    print(f"    🌍 Fusion des fichiers pour : {country_folder}")
+    country_code, flag = extract_country_info(country_folder)
+    # 🔹 Schéma compact dès la fusion : catégories et entiers courts au lieu d'objets Python
+    merged_data = chart_schema.compact(merge_csv_files_from_folder(country_path, country_code))
+    return merged_data, continent, country_code, flag
 
-                    country_code, flag = extract_country_info(country_folder)
-                    merged_data = merge_csv_files_from_folder(country_path, country_code)
+# 🔹 workers > 1 : les pays sont répartis sur un pool de processus,
+#    executor.map conserve l'ordre des pays donc le résultat est identique au mode série
+#    (les métriques par fichier restent alors dans les processus du pool, seule la durée totale est gardée)
+def merge_all_countries(base_folder, workers=1):
+    tasks = list_country_folders(base_folder)
 
-                    all_data.append((merged_data, continent, country_code, flag))
+    with metrics.timer("pipeline_stage_seconds", stage="merge"):
+        if workers > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                all_data = list(executor.map(merge_country, *zip(*tasks)))
+        else:
+            all_data = [merge_country(*task) for task in tasks]
 
-    final_df = pd.concat([data[0] for data in all_data], ignore_index=True)
+    with metrics.timer("pipeline_stage_seconds", stage="concat"):
+        final_df = pd.concat([data[0] for data in all_data], ignore_index=True)
     return final_df, all_data
 
 def clean_data(df):
@@ -72,19 +101,204 @@ def clean_data(df):
     df.drop(columns=['previous_rank'], errors='ignore', inplace=True)
     return df
 
-def save_merged_data(df, all_data):
-    for merged_data, continent, country_code, flag in all_data:
-        continent_folder = os.path.join(OUTPUT_DIR, continent)
-        if not os.path.exists(continent_folder):
-            os.makedirs(continent_folder)
+def country_output_file(continent, country_code, flag):
+    return os.path.join(OUTPUT_DIR, continent, f"charts_{country_code}{flag}.csv")
 
-        output_file = os.path.join(continent_folder, f"charts_{country_code}{flag}.csv")
+def save_country_data(country_df, continent, country_code, flag):
+    continent_folder = os.path.join(OUTPUT_DIR, continent)
+    if not os.path.exists(continent_folder):
+        os.makedirs(continent_folder)
 
-        country_df = df[df['country'] == country_code]
+    output_file = country_output_file(continent, country_code, flag)
+    with metrics.timer("pipeline_stage_seconds", stage="write"):
         country_df.to_csv(output_file, index=False)
-        print(f"✅ Fichier {output_file} créé avec succès !")
+        chart_store.write_country(country_df, "no_info", continent, country_code, flag)
+    print(f"✅ Fichier {output_file} créé avec succès !")
+
+# 🔹 Chaque pays est écrit directement depuis sa propre partition
+def save_merged_data(all_data):
+    for merged_data, continent, country_code, flag in all_data:
+        save_country_data(clean_data(merged_data), continent, country_code, flag)
+
+# 🔹 Fusion en flux : un fichier hebdomadaire lu à la fois (colonnes utiles, top 50 filtré tout de suite),
+#    un pays fusionné, écrit puis libéré avant le suivant. La mémoire reste bornée à un pays,
+#    quel que soit le nombre de marchés, et aucun tri global n'est nécessaire.
+def read_weekly_file(file_path, country_code):
+    with metrics.timer("pipeline_stage_seconds", stage="parse"):
+        df = pd.read_csv(file_path, usecols=STREAM_COLUMNS)
+    metrics.inc("pipeline_files_total", country=country_code)
+
+    with metrics.timer("pipeline_stage_seconds", stage="filter"):
+        df = df.loc[df['rank'] <= TOP_RANK, STREAM_COLUMNS].sort_values('rank', kind='stable')
+        df['country'] = country_code
+        df['week_date'] = extract_week_date(file_path)
+        df['track_id'] = df['uri'].str.rsplit(':', n=1).str[-1]
+    return df
+
+# 🔹 Fusion k-way des blocs hebdomadaires déjà triés par rang : les blocs sont rangés par semaine
+#    décroissante, seuls les blocs d'une même semaine sont re-triés entre eux (stable, par rang)
+def merge_sorted_runs(runs):
+    by_week = defaultdict(list)
+    for week_date, run in runs:
+        by_week[week_date].append(run)
+
+    ordered = []
+    for week_date in sorted(by_week, reverse=True):
+        week_runs = by_week[week_date]
+        if len(week_runs) > 1:
+            ordered.append(pd.concat(week_runs, ignore_index=True).sort_values('rank', kind='stable'))
+        else:
+            ordered.append(week_runs[0])
+    return pd.concat(ordered, ignore_index=True)
+
+def stream_country(country_path, continent, country_folder):
+    country_code, flag = extract_country_info(country_folder)
+    runs = ((extract_week_date(file), read_weekly_file(os.path.join(country_path, file), country_code))
+            for file in list_csv_files(country_path))
+    with metrics.timer("pipeline_stage_seconds", stage="concat"):
+        # Même résultat que clean_data(merge_country(...)) : dates typées, triées, sans previous_rank
+        country_df = chart_schema.compact(merge_sorted_runs(runs))
+    save_country_data(country_df, continent, country_code, flag)
+    return len(country_df)
+
+def stream_all_countries(base_folder):
+    total_rows = 0
+    for country_path, continent, country_folder in list_country_folders(base_folder):
+        rows = stream_country(country_path, continent, country_folder)
+        total_rows += rows
+        print(f"    🌍 {country_folder} : {rows} lignes (pic RSS {metrics.peak_rss_mb()} Mo)")
+    print(f"📈 {total_rows} lignes écrites, pic RSS {metrics.peak_rss_mb()} Mo")
+    return total_rows
+
+# 🔹 Comparaison des temps de fusion entre le mode série et le pool de processus
+def compare_timings(base_folder, workers):
+    start = time.perf_counter()
+    serial_df, _ = merge_all_countries(base_folder, workers=1)
+    serial_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parallel_df, _ = merge_all_countries(base_folder, workers=workers)
+    parallel_time = time.perf_counter() - start
+
+    print(f"⏱️ Série : {serial_time:.2f} s")
+    print(f"⏱️ Parallèle ({workers} processus) : {parallel_time:.2f} s (x{serial_time / parallel_time:.1f})")
+    print(f"🔍 Résultats identiques : {serial_df.equals(parallel_df)}")
+
+# 🔹 Manifeste par pays : fichiers hebdomadaires déjà intégrés (mtime, taille, empreinte)
+def manifest_path(country_folder):
+    return os.path.join(MANIFEST_DIR, f"{country_folder}.json")
+
+def load_manifest(country_folder):
+    path = manifest_path(country_folder)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(country_folder, manifest):
+    if not os.path.exists(MANIFEST_DIR):
+        os.makedirs(MANIFEST_DIR)
+    with open(manifest_path(country_folder), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+def file_hash(file_path):
+    with open(file_path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def file_entry(file_path, previous=None):
+    stat = os.stat(file_path)
+    # 🔹 On ne recalcule l'empreinte que si la date de modification ou la taille a bougé
+    if previous and previous["mtime"] == stat.st_mtime and previous["size"] == stat.st_size:
+        return previous
+    return {"mtime": stat.st_mtime, "size": stat.st_size, "sha1": file_hash(file_path)}
+
+def build_manifest(folder_path, files, previous=None):
+    previous = previous or {}
+    return {file: file_entry(os.path.join(folder_path, file), previous.get(file)) for file in files}
+
+# 🔹 Fusion incrémentale d'un pays : seuls les fichiers nouveaux ou modifiés sont relus
+def merge_country_incremental(country_path, continent, country_folder):
+    country_code, flag = extract_country_info(country_folder)
+    output_file = country_output_file(continent, country_code, flag)
+    all_files = list_csv_files(country_path)
+    previous = load_manifest(country_folder)
+
+    if previous is None or not os.path.exists(output_file):
+        print(f"    🌍 Fusion complète pour : {country_folder}")
+        country_df = clean_data(chart_schema.compact(merge_csv_files_from_folder(country_path, country_code)))
+        save_country_data(country_df, continent, country_code, flag)
+        save_manifest(country_folder, build_manifest(country_path, all_files))
+        return True
+
+    manifest = build_manifest(country_path, all_files, previous)
+    changed_files = [f for f in all_files if previous.get(f, {}).get("sha1") != manifest[f]["sha1"]]
+    removed_files = [f for f in previous if f not in manifest]
+
+    if not changed_files and not removed_files:
+        save_manifest(country_folder, manifest)
+        print(f"    ⏭️ Aucun nouveau fichier pour : {country_folder}")
+        return False
+
+    print(f"    🌍 {len(changed_files) + len(removed_files)} fichier(s) ajouté(s), modifié(s) ou supprimé(s) pour : {country_folder}")
+    stale_weeks = {extract_week_date(f) for f in changed_files + removed_files}
+
+    with metrics.timer("pipeline_stage_seconds", stage="parse"):
+        existing_df = pd.read_csv(output_file)
+    existing_df = existing_df[~existing_df['week_date'].isin(stale_weeks)]
+    new_dfs = [process_file(os.path.join(country_path, f), country_code) for f in changed_files]
+
+    country_df = clean_data(chart_schema.compact(pd.concat([existing_df] + new_dfs, ignore_index=True)))
+    save_country_data(country_df, continent, country_code, flag)
+    save_manifest(country_folder, manifest)
+    return True
+
+def refresh_manifests(base_folder):
+    for continent in os.listdir(base_folder):
+        continent_path = os.path.join(base_folder, continent)
+        if os.path.isdir(continent_path):
+            for country_folder in os.listdir(continent_path):
+                country_path = os.path.join(continent_path, country_folder)
+                if os.path.isdir(country_path):
+                    save_manifest(country_folder, build_manifest(country_path, list_csv_files(country_path)))
+
+def merge_all_countries_incremental(base_folder):
+    updated = []
+    for continent in os.listdir(base_folder):
+        continent_path = os.path.join(base_folder, continent)
+        if os.path.isdir(continent_path):
+            print(f"📂 Traitement du continent : {continent}")
+
+            for country_folder in os.listdir(continent_path):
+                country_path = os.path.join(continent_path, country_folder)
+
+                if os.path.isdir(country_path) and merge_country_incremental(country_path, continent, country_folder):
+                    updated.append(country_folder)
+    return updated
 
 if __name__ == "__main__":
-    merged_data, all_data = merge_all_countries(BASE_DIR)
-    cleaned_data = clean_data(merged_data)
-    save_merged_data(cleaned_data, all_data)
+    parser = argparse.ArgumentParser(description="Fusion des classements hebdomadaires par pays")
+    parser.add_argument("--incremental", action="store_true",
+                        help="ne relit que les fichiers hebdomadaires nouveaux ou modifiés")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="nombre de processus pour fusionner les pays en parallèle "
+                             "(tous les pays en mémoire ; par défaut, fusion en flux pays par pays)")
+    parser.add_argument("--compare", action="store_true",
+                        help="compare les temps de fusion série / parallèle sans rien écrire")
+    parser.add_argument("--report", help="écrit le rapport JSON des métriques du run dans ce fichier")
+    parser.add_argument("--profile", help="écrit les piles du profileur (METRICS_PROFILE) dans ce fichier")
+    args = parser.parse_args()
+    metrics.start_profiler_from_env()
+
+    if args.compare:
+        compare_timings(BASE_DIR, max(args.workers, os.cpu_count() or 1))
+    elif args.incremental:
+        updated = merge_all_countries_incremental(BASE_DIR)
+        print(f"🔄 {len(updated)} pays mis à jour")
+    elif args.workers > 1:
+        _, all_data = merge_all_countries(BASE_DIR, workers=args.workers)
+        save_merged_data(all_data)
+        refresh_manifests(BASE_DIR)
+    else:
+        stream_all_countries(BASE_DIR)
+        refresh_manifests(BASE_DIR)
+    metrics.finish_run(args.report, args.profile)
@@ -0,0 +1,122 @@
+import sqlite3
+import threading
+import pickle
+import json
+import time
+import os
+
+# 🔹 Base SQLite (mode WAL) des métadonnées Spotify : remplace spotify_cache.pkl
+METADATA_DB = "spotify_metadata.db"
+
+# 🔹 Durée de validité des entrées : popularité et followers évoluent
+TRACK_TTL = 7 * 24 * 3600
+ARTIST_TTL = 7 * 24 * 3600
+
+# Limite de variables par requête SQLite
+CHUNK_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    track_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artists (
+    artist_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+TABLES = {"tracks": "track_id", "artists": "artist_id"}
+
+
+def _chunks(ids, size=CHUNK_SIZE):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+class MetadataStore:
+    def __init__(self, path=METADATA_DB, track_ttl=TRACK_TTL, artist_ttl=ARTIST_TTL):
+        self.path = path
+        self.ttl = {"tracks": track_ttl, "artists": artist_ttl}
+        # Une connexion partagée protégée par un verrou pour les threads du processus,
+        # WAL + busy_timeout pour les écrivains d'autres processus
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    # 🔹 Lecture par lot ; les entrées plus vieilles que le TTL sont ignorées (à rafraîchir)
+    def _get_many(self, table, ids, fresh_only=True):
+        key = TABLES[table]
+        ids = [i for i in dict.fromkeys(ids) if i is not None]
+        min_fetched_at = time.time() - self.ttl[table] if fresh_only else 0
+        result = {}
+        with self.lock:
+            for chunk in _chunks(ids):
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT {key}, data FROM {table} WHERE {key} IN ({placeholders}) AND fetched_at >= ?",
+                    (*chunk, min_fetched_at))
+                for item_id, data in rows:
+                    result[item_id] = json.loads(data)
+        return result
+
+    # 🔹 Écriture par lot en une transaction : coût proportionnel aux changements
+    def _upsert_many(self, table, items, fetched_at=None):
+        key = TABLES[table]
+        fetched_at = fetched_at or time.time()
+        rows = [(item_id, json.dumps(data), fetched_at) for item_id, data in items.items() if item_id is not None]
+        if not rows:
+            return
+        with self.lock, self.conn:
+            self.conn.executemany(
+                f"INSERT INTO {table} ({key}, data, fetched_at) VALUES (?, ?, ?) "
+                f"ON CONFLICT({key}) DO UPDATE SET data = excluded.data, fetched_at = excluded.fetched_at",
+                rows)
+
+    def get_track(self, track_id):
+        return self.get_tracks([track_id]).get(track_id)
+
+    def get_artist(self, artist_id):
+        return self.get_artists([artist_id]).get(artist_id)
+
+    def get_tracks(self, track_ids, fresh_only=True):
+        return self._get_many("tracks", track_ids, fresh_only)
+
+    def get_artists(self, artist_ids, fresh_only=True):
+        return self._get_many("artists", artist_ids, fresh_only)
+
+    def upsert_tracks(self, tracks, fetched_at=None):
+        self._upsert_many("tracks", tracks, fetched_at)
+
+    def upsert_artists(self, artists, fetched_at=None):
+        self._upsert_many("artists", artists, fetched_at)
+
+    def count(self, table):
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    # 🔹 Migration unique depuis l'ancien cache pickle (dates = date de modification du fichier)
+    def migrate_from_pickle(self, cache_file):
+        if not os.path.exists(cache_file):
+            return 0, 0
+        with open(cache_file, "rb") as f:
+            track_info_cache, artist_info_cache = pickle.load(f)
+        fetched_at = os.path.getmtime(cache_file)
+        self.upsert_tracks(track_info_cache, fetched_at)
+        self.upsert_artists({k: v for k, v in artist_info_cache.items() if v}, fetched_at)
+        print(f"📦 Migration de {cache_file} : {len(track_info_cache)} morceaux, {len(artist_info_cache)} artistes")
+        return len(track_info_cache), len(artist_info_cache)
+
+
+if __name__ == "__main__":
+    store = MetadataStore()
+    store.migrate_from_pickle("spotify_cache.pkl")
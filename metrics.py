@@ -0,0 +1,305 @@
+import collections
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# 🔹 Instrumentation partagée par le pipeline et le dashboard : compteurs et histogrammes de durées,
+#    exportés au format texte Prometheus (/metrics) ou dans un rapport JSON de fin de run.
+#    Chaque processus a son propre registre (un worker gunicorn = un jeu de séries).
+
+# Bornes des histogrammes de durées (secondes)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 🔹 Profileur par échantillonnage activé sans modifier le code : METRICS_PROFILE=<intervalle en secondes>
+PROFILE_ENV = "METRICS_PROFILE"
+PROFILE_INTERVAL = 0.01
+PROFILE_DEPTH = 40
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in items)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(items, escaped)) + "}"
+
+
+class Histogram:
+    """Nombre d'observations, somme et répartition par bornes cumulées"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self):
+        total, result = 0, []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """Estimation par la borne du premier intervalle qui atteint le quantile"""
+        if not self.count:
+            return None
+        target = q * self.count
+        for bound, total in self.cumulative():
+            if total >= target:
+                return bound
+        return self.max
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = collections.defaultdict(dict)
+        self.histograms = collections.defaultdict(dict)
+        self.help = {}
+        self.started_at = time.time()
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = _key(labels)
+        with self.lock:
+            series = self.counters[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _key(labels)
+        with self.lock:
+            series = self.histograms[name]
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started_at = time.time()
+
+    def counter_value(self, name, **labels):
+        with self.lock:
+            return self.counters.get(name, {}).get(_key(labels), 0)
+
+    def prometheus(self):
+        """Exposition texte Prometheus (version 0.0.4)"""
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(series.items()):
+                    for bound, total in histogram.cumulative():
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {total}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def report(self):
+        """Rapport JSON : compteurs, puis nombre / total / moyenne / p50 / p99 / max de chaque durée"""
+        with self.lock:
+            counters = {
+                name: [{"labels": dict(key), "value": value} for key, value in sorted(series.items())]
+                for name, series in sorted(self.counters.items())
+            }
+            timings = {
+                name: [{
+                    "labels": dict(key),
+                    "count": h.count,
+                    "total_seconds": round(h.sum, 6),
+                    "mean_seconds": round(h.sum / h.count, 6) if h.count else None,
+                    "p50_seconds": h.quantile(0.5),
+                    "p99_seconds": h.quantile(0.99),
+                    "max_seconds": round(h.max, 6),
+                } for key, h in sorted(series.items())]
+                for name, series in sorted(self.histograms.items())
+            }
+            # Copie prise sous le verrou : les threads des requêtes continuent d'incrémenter les compteurs
+            cache_requests = dict(self.counters.get("metadata_cache_requests_total", {}))
+        hit_ratios = {}
+        for key, value in cache_requests.items():
+            labels = dict(key)
+            hits, total = hit_ratios.get(labels["cache"], (0, 0))
+            hit_ratios[labels["cache"]] = (hits + value * (labels["result"] == "hit"), total + value)
+        return {
+            "started_at": self.started_at,
+            "duration_seconds": round(time.time() - self.started_at, 3),
+            "pid": os.getpid(),
+            "peak_rss_mb": peak_rss_mb(),
+            "counters": counters,
+            "timings": timings,
+            "cache_hit_ratio": {cache: round(hits / total, 4) if total else None
+                                for cache, (hits, total) in sorted(hit_ratios.items())},
+        }
+
+
+REGISTRY = Registry()
+
+describe = REGISTRY.describe
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+prometheus = REGISTRY.prometheus
+report = REGISTRY.report
+
+describe("pipeline_stage_seconds", "Durée des étapes du pipeline (parse, filter, concat, write, enrich)")
+describe("pipeline_files_total", "Fichiers hebdomadaires lus par le pipeline")
+describe("spotify_api_batch_seconds", "Durée d'un lot de 50 identifiants envoyé à l'API Spotify (reprises comprises)")
+describe("spotify_api_requests_total", "Requêtes HTTP envoyées à l'API Spotify, par code de réponse")
+describe("spotify_api_rate_limited_total", "Réponses 429 reçues de l'API Spotify")
+describe("spotify_api_errors_total", "Lots abandonnés après épuisement des reprises")
+describe("metadata_cache_requests_total", "Lectures du cache des métadonnées (morceaux, artistes) : hit ou miss")
+describe("http_request_duration_seconds", "Latence des routes du dashboard")
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus depuis son démarrage (Mo), None si indisponible"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux : kilo-octets, macOS : octets
+    return round(peak / 1024 ** (2 if sys.platform == "darwin" else 1), 1)
+
+
+def write_report(path, extra=None):
+    """Écrit le rapport JSON du run (écriture atomique) ; extra est fusionné à la racine"""
+    payload = report()
+    payload.update(extra or {})
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+# 🔹 Profileur par échantillonnage : un thread relève la pile de tous les autres threads à intervalle fixe.
+#    Les piles sont agrégées au format "collapsed" (une ligne par pile, fonctions séparées par ';'),
+#    lisible directement par flamegraph.pl ou speedscope.
+class SamplingProfiler:
+    def __init__(self, interval=PROFILE_INTERVAL, depth=PROFILE_DEPTH):
+        self.interval = interval
+        self.depth = depth
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def _stack(self, frame):
+        names = []
+        while frame is not None and len(names) < self.depth:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, frame in frames.items():
+                    if thread_id != own:
+                        self.stacks[self._stack(frame)] += 1
+                self.samples += 1
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True, name="sampling-profiler")
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def collapsed(self):
+        with self.lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, limit=20):
+        """Fonctions les plus souvent en haut de pile : [(fonction, part des échantillons)]"""
+        with self.lock:
+            leaves = collections.Counter()
+            for stack, count in self.stacks.items():
+                leaves[stack.rsplit(";", 1)[-1]] += count
+            total = sum(leaves.values()) or 1
+            return [(name, round(count / total, 4)) for name, count in leaves.most_common(limit)]
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        return path
+
+
+PROFILER = None
+
+
+def start_profiler_from_env():
+    """Démarre le profileur si METRICS_PROFILE est défini (1 ou intervalle en secondes), sinon ne fait rien"""
+    global PROFILER
+    value = os.getenv(PROFILE_ENV)
+    if not value or value == "0" or PROFILER is not None:
+        return PROFILER
+    interval = PROFILE_INTERVAL if value == "1" else float(value)
+    PROFILER = SamplingProfiler(interval).start()
+    return PROFILER
+
+
+def finish_run(report_file=None, profile_file=None):
+    """Fin d'un script du pipeline : rapport JSON et piles du profileur si demandés"""
+    extra = {"argv": sys.argv}
+    if PROFILER is not None:
+        extra["profile_top"] = PROFILER.top()
+        if profile_file:
+            PROFILER.save(profile_file)
+            print(f"🔥 Profil enregistré dans {profile_file}")
+    if report_file:
+        write_report(report_file, extra)
+        print(f"📈 Rapport de métriques enregistré dans {report_file}")
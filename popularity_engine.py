@@ -0,0 +1,143 @@
+import pandas as pd
+import chart_store
+
+# 🔹 Règle de popularité : top 10 avec plus de 2 semaines de classement
+TOP_RANK = 10
+MIN_WEEKS = 2
+# 🔹 Chanson internationale : populaire dans au moins 3 continents
+MIN_CONTINENTS = 3
+
+SEASON_KEYWORDS = {
+    "christmas": "Christmas",
+    "holiday": "Holiday",
+    "winter": "Winter",
+    "summer": "Summer",
+    "halloween": "Halloween"
+}
+
+
+def continent_label(continent_folder):
+    return continent_folder.replace("Charts_", "").replace("_", " ")
+
+
+def seasonal_tag(genre):
+    genre = genre.lower() if isinstance(genre, str) else ""
+    for keyword, season in SEASON_KEYWORDS.items():
+        if keyword in genre:
+            return season
+    return None
+
+
+def _contains(values, pattern):
+    # Recherche sur les valeurs distinctes seulement, puis projection sur toutes les lignes
+    values = values.astype("category")
+    matches = values.cat.categories.str.contains(pattern, case=False, na=False)
+    return pd.Series(matches[values.cat.codes], index=values.index) & (values.cat.codes >= 0)
+
+
+class PopularityEngine:
+    """Tous les pays chargés une seule fois dans un seul DataFrame, règles évaluées par groupby"""
+
+    def __init__(self, charts):
+        charts = charts.copy()
+        # Catégories dans l'ordre d'apparition des pays, pour garder l'ordre des fichiers dans les résultats
+        countries = charts["country"].astype(str).str.lower()
+        charts["country"] = pd.Categorical(countries, categories=countries.unique())
+        charts["continent"] = pd.Categorical(charts["continent"], categories=charts["continent"].unique())
+        self.charts = charts
+
+        # Nombre de pays par continent (dénominateur de la règle de majorité)
+        self.countries_per_continent = charts.groupby("continent", observed=True)["country"].nunique()
+
+        # Comme search_tracks() : la première ligne (semaine la plus récente) de chaque morceau par pays
+        latest = charts.drop_duplicates(subset=["country", "track_name", "artist_names"])
+        latest = latest.assign(qualifies=(latest["rank"] <= TOP_RANK) & (latest["weeks_on_chart"] > MIN_WEEKS))
+        self.latest = latest.reset_index(drop=True)
+
+    @classmethod
+    def from_store(cls):
+        charts = chart_store.load_enriched()
+        charts["continent"] = charts["continent"].map(continent_label)
+        return cls(charts)
+
+    def _popular_continents(self, continent_counts):
+        totals = self.countries_per_continent.reindex(continent_counts.index)
+        return [continent for continent in continent_counts[continent_counts > totals / 2].index]
+
+    # 🔹 Même résultat que analyze_popularity(), en un seul passage sur tous les pays
+    def analyze(self, song_name, artist_name):
+        latest = self.latest
+        mask = _contains(latest["track_name"], song_name) & _contains(latest["artist_names"], artist_name)
+        hits = latest[mask & latest["qualifies"]]
+
+        continent_counts = hits.groupby("continent", observed=True).size()
+        popular_continents = self._popular_continents(continent_counts)
+        is_international = len(popular_continents) >= MIN_CONTINENTS
+
+        song_details = {}
+        if not hits.empty:
+            first = hits.iloc[0]
+            song_details = {
+                "release_date": first.get("release_date", "N/A"),
+                "genre": first.get("genre", "Unknown"),
+                "track_image": first.get("track_image", ""),
+                "artist_image": first.get("artist_image", "")
+            }
+
+        seasonal_message = ""
+        if "genre" in hits.columns:
+            seasons = [season for season in hits["genre"].map(seasonal_tag) if season]
+            if seasons:
+                seasonal_message = f"\n🎄 Tracks for {seasons[-1]}!"
+
+        country_popularity = hits["country"].astype(str).tolist()
+        country_streams = dict(zip(country_popularity, hits["streams"].tolist()))
+        return country_popularity, popular_continents, is_international, country_streams, song_details, seasonal_message
+
+    # 🔹 Plusieurs couples (titre, artiste) : le filtrage se fait sur les couples distincts déjà qualifiés
+    def analyze_batch(self, pairs):
+        hits = self.latest[self.latest["qualifies"]]
+        keys = hits[["track_name", "artist_names"]].drop_duplicates()
+
+        rows = []
+        for song_name, artist_name in pairs:
+            matched = keys[_contains(keys["track_name"], song_name) & _contains(keys["artist_names"], artist_name)]
+            song_hits = hits.merge(matched, on=["track_name", "artist_names"])
+            popular_continents = self._popular_continents(song_hits.groupby("continent", observed=True).size())
+            rows.append({
+                "track_name": song_name,
+                "artist_name": artist_name,
+                "popular_countries": song_hits["country"].astype(str).tolist(),
+                "popular_continents": popular_continents,
+                "is_international": len(popular_continents) >= MIN_CONTINENTS,
+            })
+        return pd.DataFrame(rows)
+
+    # 🔹 Classement de tous les morceaux (ou d'une liste de track_id) en quelques groupby.
+    #    Sans week_date on regarde la semaine la plus récente de chaque morceau par pays (comme analyze),
+    #    avec week_date on évalue la règle sur le classement de cette semaine-là.
+    def classify_tracks(self, track_ids=None, week_date=None):
+        charts = self.charts
+        if week_date is not None:
+            week_date = pd.to_datetime(week_date).strftime("%Y-%m-%d")
+            charts = charts[charts["week_date"].astype(str) == week_date]
+        latest = charts.drop_duplicates(subset=["country", "track_id"])
+        if track_ids is not None:
+            latest = latest[latest["track_id"].isin(track_ids)]
+        hits = latest[(latest["rank"] <= TOP_RANK) & (latest["weeks_on_chart"] > MIN_WEEKS)]
+
+        per_continent = hits.groupby(["track_id", "continent"], observed=True).size().rename("count").reset_index()
+        totals = per_continent["continent"].map(self.countries_per_continent).astype(float)
+        popular = per_continent[per_continent["count"] > totals / 2]
+
+        result = pd.DataFrame(index=pd.Index(latest["track_id"].unique(), name="track_id"))
+        result["popular_countries"] = hits.groupby("track_id")["country"].agg(lambda s: s.astype(str).tolist())
+        result["popular_continents"] = popular.groupby("track_id")["continent"].agg(lambda s: s.astype(str).tolist())
+        for column in ["popular_countries", "popular_continents"]:
+            result[column] = result[column].apply(lambda value: value if isinstance(value, list) else [])
+        result["is_international"] = result["popular_continents"].str.len() >= MIN_CONTINENTS
+        return result
+
+    # 🔹 Classement de tous les morceaux présents dans les charts d'une semaine donnée
+    def classify_week(self, week_date):
+        return self.classify_tracks(week_date=week_date)
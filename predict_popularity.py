@@ -1,15 +1,14 @@
 import pandas as pd
-from collections import defaultdict
 import os
+import time
+import argparse
+import chart_store
+import metrics
+from popularity_engine import PopularityEngine, SEASON_KEYWORDS, TOP_RANK, MIN_WEEKS, MIN_CONTINENTS, seasonal_tag
+from trajectory_index import TrajectoryIndex, TRAJECTORY_COLUMNS
 
 # 🔹 Liste des genres ou mots-clés associés à des saisons
-season_keywords = {
-    "christmas": "Christmas",
-    "holiday": "Holiday",
-    "winter": "Winter",
-    "summer": "Summer",
-    "halloween": "Halloween"
-}
+season_keywords = SEASON_KEYWORDS
 
 # 🔹 Mapping des codes de pays vers les emojis de drapeaux
 country_to_flag = {
@@ -22,7 +21,7 @@ country_to_flag = {
 }
 
 # 🔹 Charger un fichier et identifier le pays et le continent
-def load_country_data(file_path):
+def load_country_data(file_path, columns=None):
     # Extraire le nom du fichier et le pays
     file_name = os.path.basename(file_path)
     country_code = file_name.split("_")[-1].replace(".csv", "").lower()
@@ -30,7 +29,13 @@ def load_country_data(file_path):
     # Extraire le continent à partir du chemin du fichier
     continent = file_path.split("/")[-2].replace("Charts_", "").replace("_", " ")
 
-    df = pd.read_csv(file_path)
+    # 🔹 Lecture depuis le store colonnaire s'il a été construit (positions + dimension des morceaux
+    #    jointes à la demande), sinon depuis le CSV
+    if chart_store.tracks_exist() or chart_store.store_exists("with_info"):
+        df = chart_store.load_enriched_country(os.path.basename(os.path.dirname(file_path)), country_code,
+                                               columns=columns)
+    else:
+        df = pd.read_csv(file_path, usecols=columns)
     df["country"] = country_code
     df["continent"] = continent
     return df
@@ -47,54 +52,34 @@ def search_tracks(df, track_name, artist_name):
     ]
     return results.drop_duplicates(subset=["track_name", "artist_names"]) if not results.empty else None
 
+# 🔹 Moteurs déjà construits, par liste de fichiers : les CSV ne sont lus qu'une fois
+_engines = {}
+
+def get_engine(files):
+    key = tuple(files)
+    if key not in _engines:
+        _engines[key] = PopularityEngine(pd.concat([load_country_data(file) for file in files], ignore_index=True))
+    return _engines[key]
+
 # 🔹 Analyser la popularité de la chanson par pays
 def analyze_popularity(files, song_name, artist_name):
-    country_popularity = []
-    continent_count = defaultdict(int)
-    total_countries_per_continent = defaultdict(int)
-    country_streams = {}
-    song_details = {}
-    seasonal_message = ""
+    return get_engine(files).analyze(song_name, artist_name)
 
-    for file in files:
-        df = load_country_data(file)
-        country = df["country"].iloc[0]
-        continent = df["continent"].iloc[0]
-        total_countries_per_continent[continent] += 1
-
-        tracks = search_tracks(df, song_name, artist_name)
-        if tracks is not None:
-            for _, track in tracks.iterrows():
-                if track["rank"] <= 10 and track["weeks_on_chart"] > 2:
-                    country_popularity.append(country)
-                    continent_count[continent] += 1
-                    country_streams[country] = track["streams"]
-
-                    if not song_details:
-                        song_details = {
-                            "release_date": track.get("release_date", "N/A"),
-                            "genre": track.get("genre", "Unknown"),
-                            "track_image": track.get("track_image", ""),
-                            "artist_image": track.get("artist_image", "")
-                        }
-
-                    # 🔹 Détection automatique de la saison
-                    genre = track.get("genre", "").lower()
-                    for keyword, season in season_keywords.items():
-                        if keyword in genre:
-                            seasonal_message = f"\n🎄 Tracks for {season}!"
-                            break
-
-    # 🔹 Déterminer la popularité par continent
-    popular_continents = [
-        continent for continent, count in continent_count.items()
-        if count > total_countries_per_continent[continent] / 2  # Populaire dans plus de la moitié des pays du continent
-    ]
+# 🔹 Index des trajectoires, par liste de fichiers : construit une fois, puis chaque recherche
+#    ne lit que les semaines du morceau demandé
+_trajectory_indexes = {}
 
-    # 🔹 Chanson internationale ?
-    is_international = len(popular_continents) >= 3  # Populaire dans plus de 3 continents
+def get_trajectory_index(files):
+    key = tuple(files)
+    if key not in _trajectory_indexes:
+        columns = ["track_id", "week_date"] + TRAJECTORY_COLUMNS
+        frames = [load_country_data(file, columns=columns) for file in files]
+        _trajectory_indexes[key] = TrajectoryIndex.from_countries({df["country"].iloc[0]: df for df in frames if not df.empty})
+    return _trajectory_indexes[key]
 
-    return country_popularity, popular_continents, is_international, country_streams, song_details, seasonal_message
+# 🔹 Trajectoire semaine par semaine (rang, streams, semaines classées) d'un morceau dans chaque pays
+def track_trajectory(files, track_id):
+    return get_trajectory_index(files).trajectory(track_id)
 
 # 🔹 Fichiers des classements
 files = [
@@ -131,32 +116,93 @@ files = [
     "Charts_with_info/Charts_Africa/charts_ZAF🇿🇦.csv",
 ]
 
-# 🔹 Entrée utilisateur avec emojis
-track_name = input("🎶 Entrez le titre de la chanson : ").strip()
-artist_name = input("🎤 Entrez le nom de l'artiste : ").strip()
-
-# 🔹 Analyse des résultats
-countries, continents, international, streams, details, seasonal_message = analyze_popularity(files, track_name, artist_name)
-
-# 🔹 Détails de la chanson
-print("\n**Détails de la chanson :**")
-print(f"   - Date de sortie : {details.get('release_date', 'N/A')}")
-print(f"   - Genre : {details.get('genre', 'Unknown')}")
-print(f"   - Image du titre : {details.get('track_image', 'Non disponible')}")
-print(f"   - Image de l'artiste : {details.get('artist_image', 'Non disponible')}")
-
-# 🔹 Affichage des résultats avec emojis
-print("\n🔍 **Analyse de la popularité**")
-if countries:
-    # Ajouter les drapeaux aux noms des pays
-    countries_with_flags = [f"{country}{country_to_flag.get(country, '')}" for country in countries]
-    print(f"✅ Cette chanson est populaire dans les pays suivants : {', '.join(countries_with_flags)}")
-    for country, stream_count in streams.items():
-        print(f"   - {country}{country_to_flag.get(country, '')}: {stream_count} streams")
-
-if continents:
-    print(f"🌍 Elle est populaire dans ces continents : {', '.join(continents)}")
-    if international:
-        print("🏆 **Cette chanson est un hit international !**")
-
-print(seasonal_message)
+# 🔹 Colonnes nécessaires au rapport (projection à la lecture)
+REPORT_COLUMNS = ["track_id", "track_name", "artist_names", "rank", "weeks_on_chart", "streams", "genre"]
+
+# 🔹 Résumé d'un pays : la semaine la plus récente de chaque morceau, comme analyze_popularity()
+def summarize_country(file_path):
+    df = load_country_data(file_path, columns=REPORT_COLUMNS)
+    latest = df.drop_duplicates(subset=["track_id"])
+    return latest.assign(popular=(latest["rank"] <= TOP_RANK) & (latest["weeks_on_chart"] > MIN_WEEKS))[
+        ["track_id", "track_name", "artist_names", "country", "continent", "streams", "genre", "popular"]]
+
+# 🔹 Rapport de tous les morceaux classés : un pays en mémoire à la fois,
+#    seuls les résumés (un morceau par pays) sont conservés
+def build_hit_report(files):
+    summaries = []
+    total_countries_per_continent = {}
+    for file in files:
+        summary = summarize_country(file)
+        continent = summary["continent"].iloc[0] if not summary.empty else None
+        total_countries_per_continent[continent] = total_countries_per_continent.get(continent, 0) + 1
+        summaries.append(summary)
+    summary = pd.concat(summaries, ignore_index=True)
+    tracks = summary.groupby("track_id", sort=False)
+
+    report = tracks[["track_name", "artist_names", "genre"]].first()
+    report["countries"] = tracks["country"].agg(list)
+    report["streams"] = tracks["streams"].agg(list)
+
+    popular = summary[summary["popular"]]
+    report["popular_countries"] = popular.groupby("track_id")["country"].agg(list)
+
+    per_continent = popular.groupby(["track_id", "continent"], sort=False).size().rename("count").reset_index()
+    totals = per_continent["continent"].map(total_countries_per_continent)
+    per_continent = per_continent[per_continent["count"] > totals / 2]
+    report["popular_continents"] = per_continent.groupby("track_id")["continent"].agg(list)
+
+    for column in ["popular_countries", "popular_continents"]:
+        report[column] = report[column].apply(lambda value: value if isinstance(value, list) else [])
+    report["is_international"] = report["popular_continents"].str.len() >= MIN_CONTINENTS
+    report["seasonal_tag"] = report["genre"].map(seasonal_tag)
+    return report.drop(columns=["genre"]).reset_index()
+
+def write_hit_report(files, output_file):
+    start = time.perf_counter()
+    report = build_hit_report(files)
+    report.to_parquet(output_file, index=False)
+    print(f"✅ Rapport {output_file} : {len(report)} morceaux, {int(report['is_international'].sum())} hits internationaux "
+          f"({time.perf_counter() - start:.2f} s, pic mémoire {metrics.peak_rss_mb()} Mo)")
+
+# 🔹 Mode interactif : un morceau saisi au clavier
+def interactive(files):
+    track_name = input("🎶 Entrez le titre de la chanson : ").strip()
+    artist_name = input("🎤 Entrez le nom de l'artiste : ").strip()
+
+    # 🔹 Analyse des résultats
+    countries, continents, international, streams, details, seasonal_message = analyze_popularity(files, track_name, artist_name)
+
+    # 🔹 Détails de la chanson
+    print("\n**Détails de la chanson :**")
+    print(f"   - Date de sortie : {details.get('release_date', 'N/A')}")
+    print(f"   - Genre : {details.get('genre', 'Unknown')}")
+    print(f"   - Image du titre : {details.get('track_image', 'Non disponible')}")
+    print(f"   - Image de l'artiste : {details.get('artist_image', 'Non disponible')}")
+
+    # 🔹 Affichage des résultats avec emojis
+    print("\n🔍 **Analyse de la popularité**")
+    if countries:
+        # Ajouter les drapeaux aux noms des pays
+        countries_with_flags = [f"{country}{country_to_flag.get(country, '')}" for country in countries]
+        print(f"✅ Cette chanson est populaire dans les pays suivants : {', '.join(countries_with_flags)}")
+        for country, stream_count in streams.items():
+            print(f"   - {country}{country_to_flag.get(country, '')}: {stream_count} streams")
+
+    if continents:
+        print(f"🌍 Elle est populaire dans ces continents : {', '.join(continents)}")
+        if international:
+            print("🏆 **Cette chanson est un hit international !**")
+
+    print(seasonal_message)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse de la popularité des morceaux")
+    parser.add_argument("--batch", action="store_true",
+                        help="calcule le rapport de tous les morceaux classés au lieu du mode interactif")
+    parser.add_argument("--output", default="hit_report.parquet", help="fichier Parquet du rapport")
+    args = parser.parse_args()
+
+    if args.batch:
+        write_hit_report(files, args.output)
+    else:
+        interactive(files)
@@ -0,0 +1,64 @@
+import sqlite3
+import threading
+import hashlib
+import time
+import pandas as pd
+
+# 🔹 Journal des runs d'enrichissement : lots et fichiers terminés, indexés par empreinte de l'entrée
+JOURNAL_DB = "enrichment_journal.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    input_key TEXT PRIMARY KEY,
+    input_hash TEXT NOT NULL,
+    output_file TEXT NOT NULL,
+    completed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS batches (
+    input_hash TEXT NOT NULL,
+    batch_index INTEGER NOT NULL,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (input_hash, batch_index)
+);
+"""
+
+
+# 🔹 Empreinte du contenu d'un DataFrame (indépendante du format CSV / Parquet de la source)
+def frame_hash(df):
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()
+
+
+class RunJournal:
+    def __init__(self, path=JOURNAL_DB):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def is_file_done(self, input_key, input_hash):
+        with self.lock:
+            row = self.conn.execute("SELECT input_hash, output_file FROM files WHERE input_key = ?",
+                                    (input_key,)).fetchone()
+        return row is not None and row[0] == input_hash
+
+    def completed_batches(self, input_hash):
+        with self.lock:
+            rows = self.conn.execute("SELECT batch_index FROM batches WHERE input_hash = ?", (input_hash,))
+            return {row[0] for row in rows}
+
+    def mark_batch_done(self, input_hash, batch_index):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO batches VALUES (?, ?, ?)",
+                              (input_hash, batch_index, time.time()))
+
+    # 🔹 Fichier terminé : on l'enregistre et on oublie ses lots
+    def mark_file_done(self, input_key, input_hash, output_file):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                              (input_key, input_hash, output_file, time.time()))
+            self.conn.execute("DELETE FROM batches WHERE input_hash = ?", (input_hash,))
@@ -0,0 +1,116 @@
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from chart_store import split_country_flag
+
+
+def filter_weeks(country_data, week_from=None, week_to=None):
+    """Lignes dont la semaine est dans [week_from, week_to] (dates AAAA-MM-JJ, bornes incluses)"""
+    if week_from is None and week_to is None:
+        return country_data
+    # week_date est une vraie date (schéma compact, conservé par l'instantané Arrow) ; to_datetime couvre les chaînes
+    weeks = pd.to_datetime(country_data['week_date'])
+    mask = pd.Series(True, index=country_data.index)
+    if week_from is not None:
+        mask &= weeks >= pd.Timestamp(week_from)
+    if week_to is not None:
+        mask &= weeks <= pd.Timestamp(week_to)
+    return country_data[mask.to_numpy()]
+
+
+def compute_country_charts(country_data):
+    """Top 10 des morceaux (dernière semaine de chaque morceau) et popularité moyenne par semaine"""
+    # observed=True : track_id est une catégorie (schéma compact), sans effet sur des chaînes
+    latest_data = country_data.sort_values('week_date').groupby('track_id', observed=True).last().reset_index()
+    top_tracks = latest_data.nlargest(10, 'streams')[
+        ['track_name', 'artist_names', 'streams', 'popularity', 'track_image']
+    ].to_dict('records')
+
+    # Dates sans heure : astype(str) donne directement AAAA-MM-JJ
+    popularity_trends = country_data.groupby('week_date', observed=True)['popularity'].mean().reset_index()
+    popularity_trends['week_date'] = popularity_trends['week_date'].astype(str)
+
+    return {
+        'top_tracks': top_tracks,
+        'popularity_trends': popularity_trends.to_dict('records')
+    }
+
+
+class ChartAggregates:
+    """Agrégats par pays (et par plage de semaines) calculés une seule fois, servis depuis un cache LRU
+    qui garde le résultat et son JSON sérialisé"""
+
+    def __init__(self, charts_data, cache_size=64):
+        self.charts_data = charts_data
+        self.cache_size = cache_size
+        self.responses = OrderedDict()
+        self.lock = threading.Lock()
+
+        # ('Charts_Europe', 'FRA') -> 'FRA🇫🇷' : recherche directe au lieu d'un parcours des pays
+        self.country_keys = {}
+        self._index_countries()
+
+    def _index_countries(self):
+        country_keys = {}
+        for continent, countries in self.charts_data.items():
+            for country_key in countries:
+                code, _ = split_country_flag(country_key)
+                country_keys[(continent, code)] = country_key
+        self.country_keys = country_keys
+
+    def has_continent(self, continent_key):
+        return continent_key in self.charts_data
+
+    def invalidate(self, continent_key, country_key):
+        """Oublie la réponse d'un pays rechargé (et prend en compte les nouveaux pays)"""
+        code, _ = split_country_flag(country_key)
+        with self.lock:
+            for key in [key for key in self.responses if key[:2] == (continent_key, code)]:
+                del self.responses[key]
+        self._index_countries()
+
+    def country_key(self, continent_key, country):
+        """'FRA' ou 'FRA🇫🇷' -> clé du pays dans CHARTS_DATA, ou None"""
+        code, _ = split_country_flag(country)
+        return self.country_keys.get((continent_key, code))
+
+    def response(self, continent_key, country, week_from=None, week_to=None):
+        """Retourne le corps JSON des agrégats d'un pays, ou None s'il est inconnu"""
+        entry = self._entry(continent_key, country, week_from, week_to)
+        return entry[1] if entry is not None else None
+
+    def payload(self, continent_key, country, week_from=None, week_to=None):
+        """Retourne les agrégats d'un pays (dictionnaire partagé, à ne pas modifier), ou None"""
+        entry = self._entry(continent_key, country, week_from, week_to)
+        return entry[0] if entry is not None else None
+
+    def _entry(self, continent_key, country, week_from, week_to):
+        code, _ = split_country_flag(country)
+        key = (continent_key, code, week_from, week_to)
+
+        with self.lock:
+            if key in self.responses:
+                self.responses.move_to_end(key)
+                return self.responses[key]
+
+        country_key = self.country_keys.get((continent_key, code))
+        if country_key is None:
+            return None
+
+        country_data = self.charts_data[continent_key][country_key]
+        payload = compute_country_charts(filter_weeks(country_data, week_from, week_to))
+        entry = (payload, json.dumps(payload).encode('utf-8'))
+
+        # Pays rechargé pendant le calcul : on renvoie la réponse sans la garder en cache
+        if self.charts_data[continent_key][country_key] is not country_data:
+            return entry
+
+        with self.lock:
+            self.responses[key] = entry
+            self.responses.move_to_end(key)
+            while len(self.responses) > self.cache_size:
+                self.responses.popitem(last=False)
+        return entry
@@ -1,9 +1,29 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, g, render_template, jsonify, request
 from flask_cors import CORS
 import pandas as pd
 import os
+import sys
 import json
-from collections import defaultdict
+import threading
+import time
+import hashlib
+import base64
+import bisect
+import datetime
+from collections import OrderedDict, defaultdict
+
+# Les modules partagés du pipeline (chart_store, ...) sont à la racine du dépôt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+import chart_store
+import metrics
+from spread_analytics import SpreadAnalytics
+from search_index import SearchIndex
+from trajectory_index import TrajectoryIndex
+from predictor import HitPredictor
+from aggregates import ChartAggregates, filter_weeks
+from rollups import ChartRollups, WORLD
+from compression import ResponseCompressor, choose_encoding, compress_chunks
+from data_manager import ChartDataManager
 
 app = Flask(__name__, 
             static_folder='../frontend/static',
@@ -12,23 +32,247 @@ CORS(app)
 
 # Dossiers des données
 CHARTS_DIR = "../Charts_with_info"
+STORE_DIR = "../Charts_store"
+# Intervalle de surveillance des fichiers (secondes, 0 pour désactiver le rechargement à chaud)
+POLL_INTERVAL = float(os.getenv('CHARTS_POLL_INTERVAL', '5'))
+# Instantané Arrow partagé entre les workers gunicorn (voir gunicorn.conf.py), vide en développement
+SNAPSHOT_DIR = os.getenv('CHARTS_SNAPSHOT_DIR')
+# Modèle de prédiction des hits, entraîné hors ligne (python hit_model.py --train) ou par gunicorn.conf.py
+HIT_MODEL_FILE = os.getenv('HIT_MODEL_FILE', '../hit_model.json')
+# Construction des index en arrière-plan au démarrage (désactivée sous gunicorn et par les benchmarks)
+WARM_INDEXES = os.getenv('WARM_INDEXES', '1') == '1'
+MAX_PREDICT_TRACKS = 500
+# Durée de mise en cache côté client (secondes) ; 0 : revalidation systématique via l'ETag
+CACHE_MAX_AGE = int(os.getenv('CACHE_MAX_AGE', '0'))
+MAX_PAGE_SIZE = 500
+MAX_SEARCH_RESULTS = 50
+# Borne de min_tracks sur /api/spread et nombre de réponses de la matrice gardées (LRU)
+MAX_MIN_TRACKS = 10000
+SPREAD_CACHE_SIZE = 32
+MAX_PROFILE_FUNCTIONS = 200
+EXPORT_CHUNK_ROWS = 5000
+# Profileur par échantillonnage (METRICS_PROFILE=1 ou intervalle en secondes), piles servies par /metrics/profile
+PROFILER = metrics.start_profiler_from_env()
 
 def load_all_data():
     """Charge toutes les données des charts en mémoire"""
-    all_data = {}
-    for continent in os.listdir(CHARTS_DIR):
-        continent_path = os.path.join(CHARTS_DIR, continent)
-        if os.path.isdir(continent_path):
-            all_data[continent] = {}
-            for file in os.listdir(continent_path):
-                if file.endswith('.csv'):
-                    country_code = file.split('_')[1].split('.')[0]
-                    file_path = os.path.join(continent_path, file)
-                    all_data[continent][country_code] = pd.read_csv(file_path)
-    return all_data
-
-# Charger les données au démarrage
-CHARTS_DATA = load_all_data()
+    manager = ChartDataManager(CHARTS_DIR, STORE_DIR, poll_interval=0)
+    manager.load_all()
+    return {continent: dict(countries) for continent, countries in manager.items()}
+
+# Les pays sont chargés à la demande puis rechargés individuellement quand leurs fichiers changent
+CHARTS_DATA = ChartDataManager(CHARTS_DIR, STORE_DIR, poll_interval=POLL_INTERVAL, snapshot_dir=SNAPSHOT_DIR)
+CHART_AGGREGATES = ChartAggregates(CHARTS_DATA)
+
+# L'index de recherche est construit en arrière-plan au démarrage
+SEARCH_INDEX = None
+search_index_lock = threading.Lock()
+
+def get_search_index():
+    global SEARCH_INDEX
+    if SEARCH_INDEX is None:
+        with search_index_lock:
+            if SEARCH_INDEX is None:
+                SEARCH_INDEX = SearchIndex.from_charts(CHARTS_DATA)
+    return SEARCH_INDEX
+
+# Index des trajectoires par morceau (track_id -> semaines par pays), construit comme l'index de recherche
+TRAJECTORY_INDEX = None
+trajectory_index_lock = threading.Lock()
+
+def get_trajectory_index():
+    global TRAJECTORY_INDEX
+    if TRAJECTORY_INDEX is None:
+        with trajectory_index_lock:
+            if TRAJECTORY_INDEX is None:
+                TRAJECTORY_INDEX = TrajectoryIndex.from_charts(CHARTS_DATA)
+    return TRAJECTORY_INDEX
+
+# Premières semaines par pays et matrice d'avance / retard, mises à jour pays par pays
+SPREAD = None
+spread_lock = threading.Lock()
+spread_responses = OrderedDict()
+
+def get_spread():
+    global SPREAD
+    if SPREAD is None:
+        with spread_lock:
+            if SPREAD is None:
+                SPREAD = SpreadAnalytics.from_charts(CHARTS_DATA)
+    return SPREAD
+
+def spread_response(min_tracks):
+    """(corps JSON, ETag) de la matrice, gardés tant que l'analyse n'a pas changé"""
+    spread = get_spread()
+    with spread_lock:
+        key = (spread.version, min_tracks)
+        if key in spread_responses:
+            spread_responses.move_to_end(key)
+            return spread_responses[key]
+
+    payload = spread.matrix(min_tracks)
+    payload['routes'] = spread.routes(min_tracks)
+    body = json.dumps(payload).encode('utf-8')
+    entry = (body, hashlib.md5(body).hexdigest())
+
+    with spread_lock:
+        # Seules les réponses de la version courante sont gardées, au plus SPREAD_CACHE_SIZE
+        for old_key in [k for k in spread_responses if k[0] != payload['version']]:
+            del spread_responses[old_key]
+        spread_responses[(payload['version'], min_tracks)] = entry
+        spread_responses.move_to_end((payload['version'], min_tracks))
+        while len(spread_responses) > SPREAD_CACHE_SIZE:
+            spread_responses.popitem(last=False)
+    return entry
+
+# Agrégats hebdomadaires par continent et monde, construits une fois puis mis à jour pays par pays
+ROLLUPS = None
+rollups_lock = threading.Lock()
+
+def get_rollups():
+    global ROLLUPS
+    if ROLLUPS is None:
+        with rollups_lock:
+            if ROLLUPS is None:
+                ROLLUPS = ChartRollups(CHARTS_DATA)
+    return ROLLUPS
+
+def on_country_reloaded(continent, country_key, country_data):
+    """Met à jour les index dérivés pour ce pays uniquement"""
+    global SEARCH_INDEX, TRAJECTORY_INDEX
+    CHART_AGGREGATES.invalidate(continent, country_key)
+    with search_index_lock:
+        if SEARCH_INDEX is not None:
+            SEARCH_INDEX = SEARCH_INDEX.replace_country(continent, country_key, country_data)
+    with trajectory_index_lock:
+        if TRAJECTORY_INDEX is not None:
+            TRAJECTORY_INDEX = TRAJECTORY_INDEX.replace_country(country_key, country_data)
+    if SPREAD is not None:
+        SPREAD.replace_country(country_key, country_data)
+    with rollups_lock:
+        if ROLLUPS is not None:
+            ROLLUPS.update(continent, country_key, country_data)
+
+# Modèle et indicateurs chargés une fois par worker ; les requêtes concurrentes sont regroupées en micro-lots
+PREDICTOR = None
+predictor_lock = threading.Lock()
+
+def get_predictor():
+    global PREDICTOR
+    if PREDICTOR is None:
+        with predictor_lock:
+            if PREDICTOR is None:
+                PREDICTOR = HitPredictor(CHARTS_DATA, HIT_MODEL_FILE)
+    return PREDICTOR
+
+def build_indexes():
+    get_search_index()
+    get_trajectory_index()
+    get_spread()
+    get_rollups()
+    try:
+        get_predictor().warm()
+    except FileNotFoundError as e:
+        # Modèle pas encore entraîné : les index sont prêts, /api/predict répond 503 en attendant
+        print(f"⚠️ Prédicteur non préchargé : {e}")
+
+CHARTS_DATA.add_listener(on_country_reloaded)
+CHARTS_DATA.start_watcher()
+if WARM_INDEXES:
+    threading.Thread(target=build_indexes, daemon=True).start()
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_latency(response):
+    """Histogramme de latence par route (le motif de la route, pas l'URL, pour borner le nombre de séries)"""
+    if 'request_start' in g:
+        route = request.url_rule.rule if request.url_rule is not None else 'inconnue'
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - g.request_start,
+                        route=route, method=request.method, status=response.status_code)
+    return response
+
+# Compression gzip / brotli, enregistrée après la mesure de latence pour que celle-ci inclue la compression
+ResponseCompressor(app)
+
+def versioned_tag():
+    """ETag d'une requête GET : empreinte des données chargées + chemin et paramètres"""
+    return hashlib.md5(f"{CHARTS_DATA.data_tag()}|{request.full_path}".encode('utf-8')).hexdigest()
+
+def cache_headers(response, tag, weak=False):
+    response.set_etag(tag, weak=weak)
+    if CACHE_MAX_AGE:
+        response.cache_control.public = True
+        response.cache_control.max_age = CACHE_MAX_AGE
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+def not_modified(tag):
+    """Réponse 304 si le client a déjà cette version (avant tout calcul), sinon None"""
+    if request.if_none_match.contains_weak(tag):
+        return cache_headers(Response(status=304), tag)
+    return None
+
+def week_arg(name):
+    """Date AAAA-MM-JJ d'un paramètre de requête (ValueError si elle est invalide)"""
+    value = request.args.get(name)
+    return datetime.date.fromisoformat(value).isoformat() if value else None
+
+def int_arg(name, default, maximum):
+    """Entier entre 1 et maximum d'un paramètre de requête (ValueError s'il est invalide)"""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    message = f'{name} doit être un entier entre 1 et {maximum}'
+    try:
+        number = int(value)
+    except ValueError as e:
+        raise ValueError(message) from e
+    if not 1 <= number <= maximum:
+        raise ValueError(message)
+    return number
+
+def limit_arg(default, maximum):
+    return int_arg('limit', default, maximum)
+
+def encode_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(fields):
+    """Contenu du paramètre cursor, ou None (ValueError s'il est illisible ou ne suit pas fields : {clé: type})"""
+    cursor = request.args.get('cursor')
+    if not cursor:
+        return None
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError('Curseur invalide') from e
+    # Curseur fourni par le client : mêmes clés et mêmes types que ceux écrits par encode_cursor
+    if (not isinstance(value, dict) or set(value) != set(fields)
+            or not all(type(value[name]) is kind for name, kind in fields.items())):
+        raise ValueError('Curseur invalide')
+    return value
+
+@app.route('/metrics')
+def get_metrics():
+    """Métriques du worker au format texte Prometheus"""
+    return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/profile')
+def get_profile():
+    """Piles agrégées du profileur (format collapsed pour flamegraph), s'il est activé"""
+    if PROFILER is None:
+        return jsonify({'error': 'Profileur désactivé (METRICS_PROFILE)'}), 404
+    if request.args.get('format') == 'json':
+        try:
+            limit = limit_arg(20, MAX_PROFILE_FUNCTIONS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'samples': PROFILER.samples, 'top': PROFILER.top(limit)})
+    return Response(PROFILER.collapsed(), mimetype='text/plain')
 
 @app.route('/api/search')
 def search_track():
@@ -37,29 +281,27 @@ def search_track():
     
     if not query:
         return jsonify([])
-    
-    results = []
-    for continent_data in CHARTS_DATA.values():
-        for country_data in continent_data.values():
-            tracks = country_data.to_dict('records')
-            for track in tracks:
-                if (query in track['track_name'].lower() or 
-                    query in track['artist_names'].lower()):
-                    # Éviter les doublons en vérifiant si le track_id existe déjà
-                    if not any(r['track_id'] == track['track_id'] for r in results):
-                        results.append({
-                            'track_id': track['track_id'],
-                            'track_name': track['track_name'],
-                            'artist_names': track['artist_names'],
-                            'track_image': track['track_image'],
-                            'popularity': track['popularity'],
-                            'streams': track['streams'],
-                            'country': track['country']
-                        })
-    
-    # Trier par popularité et limiter à 10 résultats
-    results.sort(key=lambda x: x['popularity'], reverse=True)
-    return jsonify(results[:10])
+
+    try:
+        limit = limit_arg(10, MAX_SEARCH_RESULTS)
+        cursor = decode_cursor({'after': int, 'data': str})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Les identifiants de documents changent quand l'index est reconstruit : curseur lié aux données
+    if cursor is not None and cursor['data'] != CHARTS_DATA.data_tag():
+        return jsonify({'error': 'Curseur expiré, relancez la recherche'}), 400
+
+    tag = versioned_tag()
+    cached = not_modified(tag)
+    if cached is not None:
+        return cached
+
+    # Les morceaux les plus populaires, via l'index construit au démarrage ; la suite via X-Next-Cursor
+    results, last = get_search_index().search_page(query, limit, cursor['after'] if cursor else None)
+    response = jsonify(results)
+    if last is not None:
+        response.headers['X-Next-Cursor'] = encode_cursor({'after': last, 'data': CHARTS_DATA.data_tag()})
+    return cache_headers(response, tag)
 
 @app.route('/')
 def index():
@@ -69,31 +311,26 @@ def index():
 @app.route('/api/continents')
 def get_continents():
     """Retourne la liste des continents disponibles"""
-    continents = [continent.replace('Charts_', '') for continent in os.listdir(CHARTS_DIR)
-                 if os.path.isdir(os.path.join(CHARTS_DIR, continent))]
+    continents = [continent.replace('Charts_', '') for continent in CHARTS_DATA]
     return jsonify(continents)
 
 @app.route('/api/countries/<continent>')
 def get_countries(continent):
     """Retourne la liste des pays pour un continent donné"""
-    continent_dir = f"Charts_{continent}"
-    continent_path = os.path.join(CHARTS_DIR, continent_dir)
+    continent_key = f"Charts_{continent}"
     
-    if not os.path.exists(continent_path):
+    if continent_key not in CHARTS_DATA:
         return jsonify({'error': 'Continent non trouvé'}), 404
     
     countries = []
-    for file in os.listdir(continent_path):
-        if file.endswith('.csv'):
-            country_code = file.split('_')[1].split('.')[0]
-            # Extraire l'emoji du pays (2 derniers caractères)
-            flag = country_code[-2:] if len(country_code) > 2 else ''
-            name = country_code[:-2] if len(country_code) > 2 else country_code
-            countries.append({
-                'code': name,
-                'name': name,
-                'flag': flag
-            })
+    # Pays listés par le store (ou les CSV en secours), sans rien charger : clés "FRA🇫🇷"
+    for country_key in CHARTS_DATA[continent_key]:
+        name, flag = chart_store.split_country_flag(country_key)
+        countries.append({
+            'code': name,
+            'name': name,
+            'flag': flag
+        })
     
     return jsonify(countries)
 
@@ -102,31 +339,178 @@ def get_charts_data(continent, country):
     """Retourne les données des charts pour un pays donné"""
     continent_key = f"Charts_{continent}"
     
-    if continent_key not in CHARTS_DATA:
+    if not CHART_AGGREGATES.has_continent(continent_key):
         return jsonify({'error': 'Continent non trouvé'}), 404
     
-    country_data = None
-    for country_code, data in CHARTS_DATA[continent_key].items():
-        if country in country_code:
-            country_data = data
-            break
-    
-    if country_data is None:
+    try:
+        week_from, week_to = week_arg('week_from'), week_arg('week_to')
+        limit = limit_arg(None, MAX_PAGE_SIZE)
+        cursor = decode_cursor({'after': str})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if CHART_AGGREGATES.country_key(continent_key, country) is None:
         return jsonify({'error': 'Pays non trouvé'}), 404
 
-    # Préparer les données pour le frontend
-    latest_data = country_data.sort_values('week_date').groupby('track_id').last().reset_index()
-    top_tracks = latest_data.nlargest(10, 'streams')[
-        ['track_name', 'artist_names', 'streams', 'popularity', 'track_image']
-    ].to_dict('records')
+    # ETag lié à la version des données : 304 sans rien recalculer si le client est à jour
+    tag = versioned_tag()
+    cached = not_modified(tag)
+    if cached is not None:
+        return cached
 
-    # Calculer l'évolution de la popularité
-    popularity_trends = country_data.groupby('week_date')['popularity'].mean().reset_index()
-    popularity_trends['week_date'] = pd.to_datetime(popularity_trends['week_date']).dt.strftime('%Y-%m-%d')
-    
+    # Agrégats calculés une fois par (pays, plage de semaines) puis servis depuis le cache
+    if limit is None and cursor is None:
+        body = CHART_AGGREGATES.response(continent_key, country, week_from, week_to)
+    else:
+        # Pagination des tendances par curseur (dernière semaine renvoyée)
+        payload = CHART_AGGREGATES.payload(continent_key, country, week_from, week_to)
+        trends = payload['popularity_trends']
+        start = bisect.bisect_right(trends, cursor['after'], key=lambda trend: trend['week_date']) if cursor else 0
+        page = trends[start:start + limit] if limit else trends[start:]
+        next_cursor = encode_cursor({'after': page[-1]['week_date']}) if page and start + len(page) < len(trends) else None
+        body = json.dumps({'top_tracks': payload['top_tracks'], 'popularity_trends': page, 'next_cursor': next_cursor})
+
+    if body is None:
+        return jsonify({'error': 'Pays non trouvé'}), 404
+    return cache_headers(Response(body, mimetype='application/json'), tag)
+
+def rollup_response(scope):
+    """Top des morceaux d'une semaine sur plusieurs pays, lu dans les agrégats précalculés"""
+    try:
+        week_date = week_arg('week')
+        limit = limit_arg(10, MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    tag = versioned_tag()
+    cached = not_modified(tag)
+    if cached is not None:
+        return cached
+
+    body = get_rollups().response(scope, week_date, limit)
+    if body is None:
+        return jsonify({'error': 'Semaine non trouvée'}), 404
+    return cache_headers(Response(body, mimetype='application/json'), tag)
+
+@app.route('/api/charts/<continent>')
+def get_continent_charts(continent):
+    """Streams cumulés, nombre de pays, rang et popularité moyens des morceaux d'un continent"""
+    continent_key = f"Charts_{continent}"
+    if not CHART_AGGREGATES.has_continent(continent_key) or not get_rollups().has_scope(continent_key):
+        return jsonify({'error': 'Continent non trouvé'}), 404
+    return rollup_response(continent_key)
+
+@app.route('/api/world')
+def get_world_charts():
+    """Mêmes agrégats sur tous les pays"""
+    return rollup_response(WORLD)
+
+def ndjson_chunk(chunk):
+    """Lignes JSON d'un bloc de lignes (dates au format AAAA-MM-JJ)"""
+    for column in chunk.columns:
+        if pd.api.types.is_datetime64_any_dtype(chunk[column]):
+            chunk = chunk.assign(**{column: chunk[column].dt.strftime('%Y-%m-%d')})
+    return chunk.to_json(orient='records', lines=True, force_ascii=False).encode('utf-8')
+
+@app.route('/api/charts/<continent>/<country>/export')
+def export_charts_data(continent, country):
+    """Toutes les lignes d'un pays en NDJSON, sérialisées et envoyées bloc par bloc"""
+    continent_key = f"Charts_{continent}"
+    if not CHART_AGGREGATES.has_continent(continent_key):
+        return jsonify({'error': 'Continent non trouvé'}), 404
+    country_key = CHART_AGGREGATES.country_key(continent_key, country)
+    if country_key is None:
+        return jsonify({'error': 'Pays non trouvé'}), 404
+    try:
+        week_from, week_to = week_arg('week_from'), week_arg('week_to')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    tag = versioned_tag()
+    cached = not_modified(tag)
+    if cached is not None:
+        return cached
+
+    country_data = filter_weeks(CHARTS_DATA[continent_key][country_key], week_from, week_to)
+
+    def chunks():
+        for start in range(0, len(country_data), EXPORT_CHUNK_ROWS):
+            yield ndjson_chunk(country_data.iloc[start:start + EXPORT_CHUNK_ROWS])
+
+    encoding = choose_encoding()
+    response = Response(compress_chunks(chunks(), encoding) if encoding else chunks(), mimetype='application/x-ndjson')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    code, _ = chart_store.split_country_flag(country_key)
+    response.headers['Content-Disposition'] = f'attachment; filename="charts_{code}.ndjson"'
+    return cache_headers(response, tag, weak=bool(encoding))
+
+@app.route('/api/tracks/<track_id>/trajectory')
+def get_track_trajectory(track_id):
+    """Retourne semaine par semaine le rang, les streams et l'ancienneté d'un morceau dans chaque pays"""
+    tag = versioned_tag()
+    cached = not_modified(tag)
+    if cached is not None:
+        return cached
+
+    trajectory = get_trajectory_index().trajectory(track_id)
+    if trajectory is None:
+        return jsonify({'error': 'Morceau non trouvé'}), 404
+
+    return cache_headers(jsonify({'track_id': track_id, 'countries': trajectory}), tag)
+
+@app.route('/api/tracks/<track_id>/spread')
+def get_track_spread(track_id):
+    """Ordre d'arrivée d'un morceau dans les pays, avec l'écart en semaines depuis le premier"""
+    tag = versioned_tag()
+    cached = not_modified(tag)
+    if cached is not None:
+        return cached
+
+    propagation = get_spread().propagation(track_id)
+    if propagation is None:
+        return jsonify({'error': 'Morceau non trouvé'}), 404
+
+    return cache_headers(jsonify({'track_id': track_id, 'countries': propagation}), tag)
+
+@app.route('/api/spread')
+def get_spread_matrix():
+    """Matrice pays -> pays : part des morceaux arrivés d'abord dans un pays et avance moyenne en semaines"""
+    try:
+        min_tracks = int_arg('min_tracks', 20, MAX_MIN_TRACKS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    body, etag = spread_response(min_tracks)
+    response = cache_headers(Response(body, mimetype='application/json'), etag)
+    return response.make_conditional(request)
+
+@app.route('/api/predict', methods=['GET', 'POST'])
+def predict_hits():
+    """Probabilité de devenir un hit international, pour un ou plusieurs morceaux"""
+    if request.method == 'POST':
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return jsonify({'error': 'Le corps doit être un objet JSON {"track_ids": [...]}'}), 400
+        track_ids = body.get('track_ids', [])
+        if not isinstance(track_ids, list) or not all(isinstance(track_id, str) for track_id in track_ids):
+            return jsonify({'error': 'track_ids doit être une liste de chaînes'}), 400
+    else:
+        track_ids = request.args.getlist('track_id')
+        track_ids += [track_id for ids in request.args.getlist('track_ids') for track_id in ids.split(',') if track_id]
+
+    if not track_ids:
+        return jsonify({'error': 'Aucun track_id fourni'}), 400
+    if len(track_ids) > MAX_PREDICT_TRACKS:
+        return jsonify({'error': f'Au plus {MAX_PREDICT_TRACKS} morceaux par requête'}), 400
+
+    try:
+        predictions, version = get_predictor().predict(track_ids)
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 503
     return jsonify({
-        'top_tracks': top_tracks,
-        'popularity_trends': popularity_trends.to_dict('records')
+        'version': version,
+        'predictions': [{'track_id': track_id, 'hit_probability': probability}
+                        for track_id, probability in predictions.items()]
     })
 
 if __name__ == '__main__':
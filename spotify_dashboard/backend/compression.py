@@ -0,0 +1,102 @@
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli est optionnel : gzip seulement s'il n'est pas installé
+    brotli = None
+
+# Réponses plus petites que ce seuil envoyées telles quelles (l'en-tête gzip coûterait plus qu'il ne gagne)
+MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+COMPRESSIBLE_TYPES = {'application/json', 'application/x-ndjson', 'text/html', 'text/plain', 'text/css',
+                      'application/javascript', 'text/javascript'}
+
+
+def choose_encoding():
+    """'br', 'gzip' ou None selon l'en-tête Accept-Encoding de la requête"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_chunks(chunks, encoding):
+    """Compression au fil de l'eau d'une réponse en flux (export NDJSON)"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+class ResponseCompressor:
+    """Compresse les réponses JSON / texte après chaque requête.
+
+    Les corps compressés sont gardés par (ETag, encodage) : une réponse servie depuis un cache
+    n'est compressée qu'une fois. L'ETag devient faible (même contenu, octets différents),
+    ce qui garde les requêtes conditionnelles valides quel que soit l'encodage.
+    """
+
+    def __init__(self, app=None, cache_size=256):
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        if app is not None:
+            app.after_request(self.after_request)
+
+    def _compressed(self, body, encoding, etag):
+        if etag is None:
+            return compress(body, encoding)
+        key = (etag, encoding)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+        data = compress(body, encoding)
+        with self.lock:
+            self.cache[key] = data
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return data
+
+    def after_request(self, response):
+        response.vary.add('Accept-Encoding')
+        if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+                or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+        encoding = choose_encoding()
+        if encoding is None:
+            return response
+        body = response.get_data()
+        if len(body) < MIN_SIZE:
+            return response
+
+        etag, _ = response.get_etag()
+        response.set_data(self._compressed(body, encoding, etag))
+        response.headers['Content-Encoding'] = encoding
+        if etag is not None:
+            response.set_etag(etag, weak=True)
+        return response
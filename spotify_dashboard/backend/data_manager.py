@@ -0,0 +1,200 @@
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Mapping
+
+import pandas as pd
+
+import chart_store
+import chart_schema
+import shared_snapshot
+
+
+class LazyContinent(Mapping):
+    """Vue pays -> DataFrame d'un continent, chaque pays est chargé au premier accès"""
+
+    def __init__(self, manager, continent):
+        self.manager = manager
+        self.continent = continent
+
+    def __getitem__(self, country_key):
+        if country_key not in self.manager.sources.get(self.continent, {}):
+            raise KeyError(country_key)
+        return self.manager.get(self.continent, country_key)
+
+    def __iter__(self):
+        return iter(list(self.manager.sources.get(self.continent, {})))
+
+    def __len__(self):
+        return len(self.manager.sources.get(self.continent, {}))
+
+
+class ChartDataManager(Mapping):
+    """Données des charts chargées à la demande et rechargées pays par pays quand les fichiers changent.
+
+    S'utilise comme l'ancien CHARTS_DATA (continent -> pays -> DataFrame). Les DataFrames chargés
+    forment un instantané remplacé d'un bloc : une requête en cours garde l'ancienne version entière.
+    """
+
+    def __init__(self, charts_dir, store_dir, poll_interval=5.0, snapshot_dir=None):
+        self.charts_dir = charts_dir
+        self.store_dir = store_dir
+        self.snapshot_dir = snapshot_dir
+        version = shared_snapshot.snapshot_version(snapshot_dir)
+        if version is not None and version != shared_snapshot.SNAPSHOT_VERSION:
+            # Instantané d'un ancien schéma (ex. week_date en catégories) : lecture du store ou des CSV
+            print(f"⚠️ Instantané {snapshot_dir} ignoré (schéma {version}, attendu {shared_snapshot.SNAPSHOT_VERSION})")
+            self.snapshot_dir = None
+        self.poll_interval = poll_interval
+        self.frames = {}
+        self.signatures = {}
+        self.sources = {}
+        self.version = 0
+        self.tag = None
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.load_locks = defaultdict(threading.Lock)
+        self.watcher = None
+        self.discover()
+
+    # Interface Mapping : continent -> pays
+    def __getitem__(self, continent):
+        if continent not in self.sources:
+            raise KeyError(continent)
+        return LazyContinent(self, continent)
+
+    def __iter__(self):
+        return iter(list(self.sources))
+
+    def __len__(self):
+        return len(self.sources)
+
+    def discover(self):
+        """Liste les pays disponibles sans rien charger"""
+        countries = chart_store.list_enriched_countries(self.store_dir)
+        self.sources = {
+            continent: {f"{code}{flag}": code for code, flag in sorted(codes.items())}
+            for continent, codes in sorted(countries.items())
+        }
+
+    def _csv_path(self, continent, country_key):
+        return os.path.join(self.charts_dir, continent, f"charts_{country_key}.csv")
+
+    def _signature(self, continent, country_key):
+        """Dates de modification du CSV et des fichiers Parquet du pays (et de la dimension des morceaux)"""
+        paths = [self._csv_path(continent, country_key)]
+        if chart_store.tracks_exist(self.store_dir):
+            # Une mise à jour des métadonnées change la signature de tous les pays
+            paths.append(chart_store.tracks_path(self.store_dir))
+            partition = chart_store.country_path(chart_store.FACTS_DATASET, continent, country_key, self.store_dir)
+        else:
+            partition = chart_store.country_path('with_info', continent, country_key, self.store_dir)
+        if os.path.isdir(partition):
+            paths += [os.path.join(partition, file) for file in sorted(os.listdir(partition))]
+        return tuple((path, os.stat(path).st_mtime_ns) for path in paths if os.path.exists(path))
+
+    def _load(self, continent, country_key):
+        # Instantané Arrow partagé entre workers (gunicorn), figé pour toute la durée du processus.
+        # Il est écrit depuis des DataFrames déjà compacts : compact() recopierait les colonnes hors du mmap
+        if shared_snapshot.snapshot_exists(self.snapshot_dir):
+            return shared_snapshot.load_snapshot_country(self.snapshot_dir, continent, country_key)
+        if chart_store.tracks_exist(self.store_dir) or chart_store.store_exists('with_info', self.store_dir):
+            frame = chart_store.load_enriched_country(continent, country_key, store_dir=self.store_dir)
+            frame = frame.drop(columns=['continent'])
+        else:
+            frame = pd.read_csv(self._csv_path(continent, country_key))
+        # Schéma compact : catégories, entiers courts, dates (sans copie des colonnes déjà typées)
+        return chart_schema.compact(frame)
+
+    def _swap(self, continent, country_key, frame, signature):
+        # Copie puis remplacement de la référence : les lecteurs ne voient jamais un état intermédiaire
+        with self.lock:
+            frames = dict(self.frames)
+            frames[(continent, country_key)] = frame
+            self.frames = frames
+            self.signatures[(continent, country_key)] = signature
+            self.version += 1
+
+    def data_tag(self):
+        """Empreinte des données (fichiers et dates de modification de tous les pays connus).
+
+        Contrairement à `version`, elle ne dépend pas des pays déjà chargés : deux workers qui servent
+        les mêmes fichiers ont la même empreinte, elle sert d'ETag partagé entre les workers.
+        """
+        version, tag = self.tag or (None, None)
+        if version != self.version:
+            version = self.version
+            # Pays chargés : signature prise au chargement ; les autres : signature actuelle de leurs fichiers
+            signatures = sorted(
+                ((continent, country_key), self.signatures.get((continent, country_key))
+                 if (continent, country_key) in self.frames else self._signature(continent, country_key))
+                for continent, countries in self.sources.items() for country_key in countries
+            )
+            tag = hashlib.md5(repr(signatures).encode('utf-8')).hexdigest()[:16]
+            self.tag = (version, tag)
+        return tag
+
+    def get(self, continent, country_key):
+        key = (continent, country_key)
+        frame = self.frames.get(key)
+        if frame is not None:
+            return frame
+        with self.load_locks[key]:
+            frame = self.frames.get(key)
+            if frame is None:
+                # Signature prise avant la lecture : un changement pendant le chargement sera revu
+                signature = self._signature(continent, country_key)
+                frame = self._load(continent, country_key)
+                self._swap(continent, country_key, frame, signature)
+        return frame
+
+    def load_all(self):
+        for continent, countries in self.sources.items():
+            for country_key in countries:
+                self.get(continent, country_key)
+
+    def add_listener(self, listener):
+        """listener(continent, country_key, frame) est appelé après chaque rechargement d'un pays"""
+        self.listeners.append(listener)
+
+    def refresh(self):
+        """Recharge les pays dont les fichiers ont changé ; retourne la liste des pays rechargés"""
+        previous_sources = {(continent, key) for continent, countries in self.sources.items() for key in countries}
+        self.discover()
+        reloaded = []
+        for continent, countries in self.sources.items():
+            for country_key in countries:
+                key = (continent, country_key)
+                # Nouveau pays : chargé tout de suite pour que les index dérivés le voient
+                if key not in previous_sources and key not in self.signatures:
+                    self.signatures[key] = None
+
+        for (continent, country_key), old_signature in list(self.signatures.items()):
+            if country_key not in self.sources.get(continent, {}):
+                continue
+            signature = self._signature(continent, country_key)
+            if signature == old_signature:
+                continue
+            with self.load_locks[(continent, country_key)]:
+                frame = self._load(continent, country_key)
+                self._swap(continent, country_key, frame, signature)
+            print(f"🔄 {continent} / {country_key} rechargé")
+            for listener in self.listeners:
+                listener(continent, country_key, frame)
+            reloaded.append((continent, country_key))
+        return reloaded
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ Erreur lors du rechargement des données : {e}")
+
+    def start_watcher(self):
+        if self.watcher is None and self.poll_interval > 0:
+            self.watcher = threading.Thread(target=self._watch, daemon=True)
+            self.watcher.start()
@@ -0,0 +1,165 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+
+from hit_model import HitFeatures, HitModel
+from popularity_engine import continent_label
+
+
+def charts_frame(charts_data):
+    """Tous les pays de CHARTS_DATA dans un seul DataFrame (colonnes country et continent ajoutées)"""
+    frames = []
+    for continent, countries in charts_data.items():
+        for country_key, country_data in countries.items():
+            frames.append(country_data.assign(country=country_key, continent=continent_label(continent)))
+    return pd.concat(frames, ignore_index=True)
+
+
+class MicroBatcher:
+    """Regroupe les demandes concurrentes en un seul appel vectorisé.
+
+    Le premier track_id reçu ouvre un lot, qui est envoyé au bout de `max_wait` secondes ou
+    dès qu'il atteint `max_batch` morceaux ; chaque demandeur récupère ses résultats via un Future.
+    predict_many(track_ids) retourne (résultats, version des données) : la version accompagne chaque résultat.
+    """
+
+    def __init__(self, predict_many, max_batch=256, max_wait=0.005):
+        self.predict_many = predict_many
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.batched_requests = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, track_ids):
+        future = Future()
+        self.requests.put((track_ids, future))
+        return future
+
+    def _collect(self):
+        batch = [self.requests.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self.requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            track_ids = list(dict.fromkeys(track_id for ids, _ in batch for track_id in ids))
+            try:
+                results, version = self.predict_many(track_ids)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.batched_requests += len(batch)
+            for ids, future in batch:
+                future.set_result(({track_id: results.get(track_id) for track_id in ids}, version))
+
+
+class HitPredictor:
+    """Prédictions de hits servies par le dashboard : modèle et indicateurs chargés une fois par worker,
+    inférence par micro-lots, cache LRU des prédictions récentes par (track_id, version des données).
+
+    Le modèle est seulement lu : il est entraîné hors ligne (python hit_model.py --train) ou par le
+    processus maître de gunicorn (on_starting), jamais par un worker.
+    """
+
+    def __init__(self, charts_data, model_file, cache_size=4096, max_batch=256, max_wait=0.005, batching=True):
+        self.charts_data = charts_data
+        self.model_file = model_file
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.model = None
+        self.features = None
+        self.version = None
+        self.batcher = MicroBatcher(self._predict_many, max_batch, max_wait) if batching else None
+
+    def _charts(self):
+        return charts_frame(self.charts_data)
+
+    def _current(self):
+        """Indicateurs (re)construits si les données ont changé depuis le dernier lot"""
+        with self.lock:
+            version = getattr(self.charts_data, 'version', 0)
+            if self.features is None or version != self.version:
+                if self.model is None:
+                    if not os.path.exists(self.model_file):
+                        raise FileNotFoundError(f"Modèle {self.model_file} introuvable : "
+                                                "l'entraîner avec python hit_model.py --train")
+                    self.model = HitModel.load(self.model_file)
+                charts = self._charts()
+                # Chargement complet : le numéro de version ne bouge plus que sur un rechargement
+                version = getattr(self.charts_data, 'version', 0)
+                self.features = HitFeatures(charts)
+                self.version = version
+            return self.features, self.model, self.version
+
+    def warm(self):
+        self._current()
+
+    def _predict_many(self, track_ids):
+        """(probabilités des morceaux connus, version) : indicateurs, modèle et version lus ensemble sous le verrou"""
+        features, model, version = self._current()
+        known = [track_id for track_id in track_ids if track_id in features.static.index]
+        probabilities = model.predict_proba(features.build(known)) if known else pd.Series(dtype=float)
+        return {track_id: float(probability) for track_id, probability in probabilities.items()}, version
+
+    def _fetch(self, track_ids, timeout):
+        if self.batcher is not None:
+            return self.batcher.submit(track_ids).result(timeout=timeout)
+        results, version = self._predict_many(track_ids)
+        return {track_id: results.get(track_id) for track_id in track_ids}, version
+
+    def predict(self, track_ids, timeout=30):
+        """{track_id: probabilité ou None si le morceau est inconnu}, dans l'ordre demandé"""
+        track_ids = list(dict.fromkeys(track_ids))
+        _, _, version = self._current()
+        results, missing = {}, []
+        with self.lock:
+            for track_id in track_ids:
+                key = (track_id, version)
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    results[track_id] = self.cache[key]
+                else:
+                    missing.append(track_id)
+
+        if missing:
+            fetched, fetched_version = self._fetch(missing, timeout)
+            if fetched_version != version:
+                # Données rechargées avant le passage du lot : les résultats lus dans le cache sont
+                # d'une autre version, toute la requête est recalculée sur la version du lot
+                missing = track_ids
+                fetched, fetched_version = self._fetch(missing, timeout)
+                results = {}
+            version = fetched_version
+            results.update(fetched)
+            if self.cache_size:
+                with self.lock:
+                    # Clés construites avec la version renvoyée par le lot qui a calculé les scores
+                    for track_id in missing:
+                        self.cache[(track_id, version)] = fetched[track_id]
+                        self.cache.move_to_end((track_id, version))
+                    while len(self.cache) > self.cache_size:
+                        self.cache.popitem(last=False)
+        return {track_id: results[track_id] for track_id in track_ids}, version
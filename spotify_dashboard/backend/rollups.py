@@ -0,0 +1,202 @@
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from popularity_engine import continent_label
+
+WORLD = 'world'
+
+# Sommes par (semaine, morceau) : additives, donc un pays modifié se retire puis se rajoute tel quel
+SUM_COLUMNS = ['streams', 'rank_sum', 'countries', 'popularity_sum', 'popularity_count']
+INFO_COLUMNS = ['track_name', 'artist_names', 'track_image']
+
+
+def _week_strings(week_dates):
+    if pd.api.types.is_datetime64_any_dtype(week_dates):
+        return week_dates.dt.strftime('%Y-%m-%d')
+    return week_dates.astype(str)
+
+
+def country_partial(country_data):
+    """Sommes d'un pays par (semaine, morceau) : streams, meilleur rang, 1 pays, popularité"""
+    frame = pd.DataFrame({
+        'week_date': _week_strings(country_data['week_date']).to_numpy(),
+        'track_id': country_data['track_id'].astype(str).to_numpy(),
+        'streams': country_data['streams'].to_numpy(dtype='int64'),
+        'rank': country_data['rank'].to_numpy(dtype='int64'),
+        'popularity': country_data['popularity'].to_numpy(dtype='float64', na_value=np.nan) if 'popularity' in country_data
+        else np.nan,
+    })
+    grouped = frame.groupby(['week_date', 'track_id'], sort=False)
+    partial = pd.DataFrame({
+        'streams': grouped['streams'].sum(),
+        'rank_sum': grouped['rank'].min(),
+        'countries': 1,
+        # La popularité est celle du morceau : une fois par pays, comme le rang
+        'popularity_sum': grouped['popularity'].max().fillna(0),
+        'popularity_count': grouped['popularity'].count().clip(upper=1),
+    })
+    return partial.astype('int64')
+
+
+def country_track_info(country_data):
+    """Nom, artistes et image de chaque morceau (dernière semaine vue dans le pays)"""
+    columns = [column for column in INFO_COLUMNS if column in country_data.columns]
+    frame = country_data[['track_id', 'week_date'] + columns].sort_values('week_date', kind='stable')
+    frame = frame.drop_duplicates('track_id', keep='last')
+    info = {}
+    for column in columns:
+        values = frame[column].astype(object)
+        info[column] = values.where(values.notna(), None).tolist()
+    track_ids = frame['track_id'].astype(str).tolist()
+    return {track_id: {column: info[column][i] for column in columns} for i, track_id in enumerate(track_ids)}
+
+
+class RollupView:
+    """Agrégats d'un ensemble de pays figés en tableaux compacts triés par (semaine, streams décroissants).
+
+    Chaque semaine est une tranche contiguë : le top N d'une semaine est une lecture des N premières lignes.
+    """
+
+    def __init__(self, sums):
+        sums = sums[sums['countries'] > 0].reset_index()
+        sums = sums.sort_values(['week_date', 'streams', 'track_id'], ascending=[True, False, True],
+                                kind='stable', ignore_index=True)
+
+        week_codes, self.weeks = pd.factorize(sums['week_date'], sort=True)
+        self.weeks = self.weeks.tolist()
+        track_codes, track_ids = pd.factorize(sums['track_id'])
+        self.track_ids = np.asarray(track_ids, dtype=object)
+        self.track_codes = track_codes.astype(np.int32)
+        self.streams = sums['streams'].to_numpy(dtype=np.int64)
+        self.countries = sums['countries'].to_numpy(dtype=np.int16)
+        self.mean_rank = (sums['rank_sum'] / sums['countries']).to_numpy(dtype=np.float32)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean_popularity = (sums['popularity_sum'] / sums['popularity_count']).to_numpy(dtype=np.float32)
+
+        bounds = np.flatnonzero(np.r_[True, week_codes[1:] != week_codes[:-1]]) if len(week_codes) else np.array([], int)
+        ends = np.r_[bounds[1:], len(week_codes)]
+        self.offsets = dict(zip(self.weeks, zip(bounds.tolist(), ends.tolist())))
+
+        # Tendances hebdomadaires (streams totaux, morceaux classés, popularité moyenne) calculées une fois
+        trends = pd.DataFrame({'week_date': sums['week_date'], 'streams': self.streams,
+                               'popularity': self.mean_popularity.astype(np.float64)})
+        trends = trends.groupby('week_date', sort=True).agg(total_streams=('streams', 'sum'),
+                                                              tracks=('streams', 'size'),
+                                                              popularity=('popularity', 'mean')).reset_index()
+        trends['popularity'] = trends['popularity'].round(2).astype(object).where(trends['popularity'].notna(), None)
+        self.trends = trends.to_dict('records')
+
+    def top(self, week_date, limit, track_info):
+        start, end = self.offsets[week_date]
+        rows = []
+        for i in range(start, min(end, start + limit)):
+            track_id = self.track_ids[self.track_codes[i]]
+            popularity = float(self.mean_popularity[i])
+            rows.append({
+                'track_id': track_id,
+                **track_info.get(track_id, {}),
+                'total_streams': int(self.streams[i]),
+                'countries': int(self.countries[i]),
+                'mean_rank': round(float(self.mean_rank[i]), 2),
+                'mean_popularity': None if np.isnan(popularity) else round(popularity, 2),
+            })
+        return rows
+
+
+class ChartRollups:
+    """Agrégats hebdomadaires par continent et pour le monde, matérialisés au chargement.
+
+    Les sommes par (semaine, morceau) de chaque pays sont gardées : un pays rechargé retire son ancienne
+    contribution à son continent et au monde, ajoute la nouvelle, puis seules ces deux vues sont refigées.
+    """
+
+    def __init__(self, charts_data, cache_size=128):
+        self.charts_data = charts_data
+        self.cache_size = cache_size
+        self.responses = OrderedDict()
+        self.lock = threading.Lock()
+        self.partials = {}
+        self.sums = {}
+        self.views = {}
+        self.track_info = {}
+        self.version = 0
+        self._build()
+
+    def _build(self):
+        by_scope = {}
+        for continent, countries in self.charts_data.items():
+            for country_key, country_data in countries.items():
+                partial = country_partial(country_data)
+                self.partials[(continent, country_key)] = partial
+                self.track_info.update(country_track_info(country_data))
+                by_scope.setdefault(continent, []).append(partial)
+
+        for continent, partials in by_scope.items():
+            self.sums[continent] = pd.concat(partials).groupby(level=[0, 1], sort=False).sum()
+        continents = list(self.sums.values())
+        empty = pd.DataFrame(columns=SUM_COLUMNS, dtype='int64',
+                             index=pd.MultiIndex.from_arrays([[], []], names=['week_date', 'track_id']))
+        self.sums[WORLD] = pd.concat(continents).groupby(level=[0, 1], sort=False).sum() if continents else empty
+        self.views = {scope: RollupView(sums) for scope, sums in self.sums.items()}
+
+    def update(self, continent, country_key, country_data):
+        """Remplace la contribution d'un pays rechargé (ou nouveau) dans son continent et dans le monde"""
+        partial = country_partial(country_data)
+        with self.lock:
+            old = self.partials.get((continent, country_key))
+            delta = partial if old is None else partial.sub(old, fill_value=0)
+            views = dict(self.views)
+            for scope in [continent, WORLD]:
+                sums = self.sums.get(scope)
+                sums = delta if sums is None else sums.add(delta, fill_value=0)
+                self.sums[scope] = sums[sums['countries'] > 0].astype('int64')
+                views[scope] = RollupView(self.sums[scope])
+            self.partials[(continent, country_key)] = partial
+            self.track_info.update(country_track_info(country_data))
+            self.views = views
+            self.version += 1
+            self.responses.clear()
+
+    def has_scope(self, scope):
+        return scope in self.views
+
+    def payload(self, scope, week_date=None, limit=10):
+        """Top `limit` d'une semaine (la dernière par défaut) et tendances ; None si la semaine est inconnue"""
+        view = self.views[scope]
+        week_date = week_date or (view.weeks[-1] if view.weeks else None)
+        if week_date not in view.offsets:
+            return None
+        return {
+            'scope': scope if scope == WORLD else continent_label(scope),
+            'week_date': week_date,
+            'weeks': view.weeks,
+            'top_tracks': view.top(week_date, limit, self.track_info),
+            'trends': view.trends,
+        }
+
+    def response(self, scope, week_date=None, limit=10):
+        """Corps JSON servi depuis le cache, ou None si la semaine est inconnue"""
+        key = (scope, week_date, limit)
+        with self.lock:
+            if key in self.responses:
+                self.responses.move_to_end(key)
+                return self.responses[key]
+            version = self.version
+
+        payload = self.payload(scope, week_date, limit)
+        if payload is None:
+            return None
+        body = json.dumps(payload).encode('utf-8')
+
+        with self.lock:
+            # Données modifiées pendant le calcul : réponse renvoyée sans être gardée
+            if version == self.version:
+                self.responses[key] = body
+                self.responses.move_to_end(key)
+                while len(self.responses) > self.cache_size:
+                    self.responses.popitem(last=False)
+        return body
@@ -0,0 +1,94 @@
+from collections import defaultdict
+
+# Champs renvoyés par /api/search pour chaque morceau
+RESULT_FIELDS = ['track_id', 'track_name', 'artist_names', 'track_image', 'popularity', 'streams', 'country']
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _popularity_key(popularity):
+    # Les popularités manquantes (NaN, ou None pour une colonne entière nullable) passent en dernier
+    return -popularity if popularity is not None and popularity == popularity else float('inf')
+
+
+def country_documents(country_data):
+    """Un document par morceau d'un pays (sa première ligne, donc la semaine la plus récente)"""
+    return country_data.drop_duplicates('track_id')[RESULT_FIELDS].to_dict('records')
+
+
+class SearchIndex:
+    """Index inversé de trigrammes sur les titres et artistes, un document par track_id"""
+
+    def __init__(self, documents_by_country):
+        # Documents de chaque pays gardés à part : un pays rechargé ne refait pas les autres
+        self.documents_by_country = documents_by_country
+
+        documents = []
+        seen = set()
+        for records in documents_by_country.values():
+            for record in records:
+                if record['track_id'] not in seen:
+                    seen.add(record['track_id'])
+                    documents.append(record)
+
+        # Documents triés une fois pour toutes par popularité décroissante,
+        # à égalité on garde l'ordre de première apparition (comme le tri stable d'avant)
+        order = sorted(range(len(documents)), key=lambda i: (_popularity_key(documents[i]['popularity']), i))
+        self.documents = [documents[i] for i in order]
+        self.names = [doc['track_name'].lower() for doc in self.documents]
+        self.artists = [doc['artist_names'].lower() for doc in self.documents]
+
+        postings = defaultdict(set)
+        for doc_id, (name, artists) in enumerate(zip(self.names, self.artists)):
+            for trigram in _trigrams(name) | _trigrams(artists):
+                postings[trigram].add(doc_id)
+        self.postings = dict(postings)
+
+    @classmethod
+    def from_charts(cls, charts_data):
+        """Construit l'index à partir de CHARTS_DATA (continent -> pays -> DataFrame)"""
+        return cls({
+            (continent, country_key): country_documents(country_data)
+            for continent, continent_data in charts_data.items()
+            for country_key, country_data in continent_data.items()
+        })
+
+    def replace_country(self, continent, country_key, country_data):
+        """Nouvel index où seuls les documents de ce pays sont recalculés"""
+        documents_by_country = dict(self.documents_by_country)
+        documents_by_country[(continent, country_key)] = country_documents(country_data)
+        return SearchIndex(documents_by_country)
+
+    def _candidates(self, query):
+        if len(query) < 3:
+            return range(len(self.documents))
+        trigrams = sorted(_trigrams(query), key=lambda t: len(self.postings.get(t, ())))
+        candidates = set(self.postings.get(trigrams[0], ()))
+        for trigram in trigrams[1:]:
+            if not candidates:
+                break
+            candidates &= self.postings.get(trigram, set())
+        return sorted(candidates)
+
+    def search(self, query, limit=10):
+        """Retourne les `limit` morceaux les plus populaires dont le titre ou l'artiste contient `query`"""
+        return self.search_page(query, limit)[0]
+
+    def search_page(self, query, limit=10, after=None):
+        """Page suivant le document `after` (les documents sont rangés par popularité décroissante).
+
+        Retourne (résultats, identifiant du dernier document de la page, ou None s'il n'y a pas de suite).
+        """
+        query = query.lower()
+        results, last = [], None
+        for doc_id in self._candidates(query):
+            if after is not None and doc_id <= after:
+                continue
+            if query in self.names[doc_id] or query in self.artists[doc_id]:
+                if len(results) == limit:
+                    return results, last
+                results.append(self.documents[doc_id])
+                last = doc_id
+        return results, None
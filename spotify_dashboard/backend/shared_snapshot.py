@@ -0,0 +1,72 @@
+import os
+import json
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+SNAPSHOT_MANIFEST = "_snapshot.json"
+# Version du schéma des colonnes (chart_schema) : à incrémenter quand les types écrits changent.
+# Les workers lisent l'instantané sans repasser par compact() : un instantané d'une autre version est ignoré
+SNAPSHOT_VERSION = 2
+
+
+def snapshot_path(snapshot_dir, continent, country_key):
+    return os.path.join(snapshot_dir, continent, f"{country_key}.arrow")
+
+
+def _to_arrow(country_data):
+    """Colonnes texte en dictionnaire (catégories triées : même ordre de tri que les chaînes)"""
+    country_data = country_data.copy()
+    for column in country_data.columns:
+        if country_data[column].dtype == object:
+            country_data[column] = country_data[column].astype('category')
+    return pa.Table.from_pandas(country_data, preserve_index=False)
+
+
+def export_snapshot(charts_data, snapshot_dir):
+    """Écrit chaque pays dans un fichier Arrow IPC, lu ensuite en mémoire partagée par les workers"""
+    manifest = {}
+    for continent, countries in charts_data.items():
+        os.makedirs(os.path.join(snapshot_dir, continent), exist_ok=True)
+        for country_key, country_data in countries.items():
+            path = snapshot_path(snapshot_dir, continent, country_key)
+            tmp_path = f"{path}.tmp"
+            table = _to_arrow(country_data)
+            with ipc.new_file(tmp_path, table.schema) as writer:
+                writer.write_table(table)
+            # Remplacement atomique : un worker qui démarre ne lit jamais un fichier à moitié écrit
+            os.replace(tmp_path, path)
+            manifest.setdefault(continent, []).append(country_key)
+
+    manifest_path = os.path.join(snapshot_dir, SNAPSHOT_MANIFEST)
+    with open(f"{manifest_path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump({'version': SNAPSHOT_VERSION, 'countries': manifest}, f, ensure_ascii=False, indent=2)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    return manifest
+
+
+def snapshot_version(snapshot_dir):
+    """Version du schéma écrite dans le manifeste, 0 pour un instantané sans version, None s'il n'existe pas"""
+    path = os.path.join(snapshot_dir, SNAPSHOT_MANIFEST) if snapshot_dir else None
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        version = json.load(f).get('version')
+    return version if isinstance(version, int) else 0
+
+
+def snapshot_exists(snapshot_dir):
+    """Instantané présent et écrit avec le schéma actuel"""
+    return snapshot_version(snapshot_dir) == SNAPSHOT_VERSION
+
+
+def load_snapshot_country(snapshot_dir, continent, country_key):
+    """Lit un pays depuis le fichier projeté en mémoire (mmap).
+
+    Les colonnes numériques restent des vues sur les pages du fichier, partagées par tous les
+    processus via le cache de pages ; seuls les codes et les valeurs distinctes des catégories
+    sont propres à chaque worker.
+    """
+    source = pa.memory_map(snapshot_path(snapshot_dir, continent, country_key), 'r')
+    table = ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
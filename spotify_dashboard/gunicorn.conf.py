@@ -0,0 +1,67 @@
+import os
+import sys
+import multiprocessing
+
+# 🔹 Configuration de production : plusieurs workers qui partagent les mêmes données en mémoire.
+#    Le maître écrit une fois un instantané Arrow des charts, chaque worker le projette en mémoire (mmap)
+#    au lieu de relire et dupliquer les CSV / Parquet : les pages du fichier sont communes à tous.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+sys.path.insert(0, os.path.join(BASE_DIR, '..'))
+
+wsgi_app = 'app:app'
+pythonpath = 'backend'
+chdir = BASE_DIR
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('WEB_THREADS', '4'))
+worker_class = 'gthread'
+timeout = 60
+# Pas de preload : l'app (et ses threads) est importée dans chaque worker, après le fork
+preload_app = False
+
+SNAPSHOT_DIR = os.getenv('CHARTS_SNAPSHOT_DIR', os.path.join(BASE_DIR, '..', 'Charts_snapshot'))
+os.environ['CHARTS_SNAPSHOT_DIR'] = SNAPSHOT_DIR
+# Le modèle des hits est entraîné une fois par le maître s'il manque ; les workers ne font que le lire
+HIT_MODEL_FILE = os.getenv('HIT_MODEL_FILE', os.path.join(BASE_DIR, '..', 'hit_model.json'))
+os.environ['HIT_MODEL_FILE'] = HIT_MODEL_FILE
+# L'instantané est figé : on le régénère en redémarrant (kill -HUP) plutôt que de surveiller les fichiers
+os.environ.setdefault('CHARTS_POLL_INTERVAL', '0')
+# Pas de construction des index au démarrage : chaque worker aurait sa copie de tous les index (recherche,
+# trajectoires, propagation, agrégats, indicateurs du modèle) et la mémoire grandirait avec le nombre de workers.
+# Un worker ne construit que les index des routes qu'il sert, au premier appel
+os.environ.setdefault('WARM_INDEXES', '0')
+
+
+def on_starting(server):
+    """Construit l'instantané (et le modèle s'il manque) une seule fois, dans le processus maître,
+    avant de lancer les workers"""
+    manager = _build_snapshot(server)
+    if not os.path.exists(HIT_MODEL_FILE):
+        _train_model(server, manager)
+
+
+def on_reload(server):
+    on_starting(server)
+
+
+def _build_snapshot(server):
+    from data_manager import ChartDataManager
+    from shared_snapshot import export_snapshot
+
+    os.chdir(BASE_DIR)
+    manager = ChartDataManager("../Charts_with_info", "../Charts_store", poll_interval=0)
+    manager.load_all()
+    manifest = export_snapshot(manager, SNAPSHOT_DIR)
+    count = sum(len(countries) for countries in manifest.values())
+    server.log.info(f"📸 Instantané des charts écrit dans {SNAPSHOT_DIR} ({count} pays)")
+    return manager
+
+
+def _train_model(server, manager):
+    from hit_model import train
+    from predictor import charts_frame
+
+    _, scores = train(charts_frame(manager), HIT_MODEL_FILE)
+    server.log.info(f"🔮 Modèle des hits entraîné et enregistré dans {HIT_MODEL_FILE} (AUC {scores['test_auc']:.3f})")
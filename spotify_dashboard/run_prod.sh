@@ -0,0 +1,10 @@
+#!/bin/bash
+
+# Installation des dépendances Python si nécessaire
+echo "📦 Installation des dépendances..."
+    pip install -r requirements.txt
+
+# Lancement en production : gunicorn, plusieurs workers partageant l'instantané des données
+echo "🚀 Démarrage du serveur (production)..."
+cd "$(dirname "$0")"
+exec gunicorn -c gunicorn.conf.py
@@ -0,0 +1,254 @@
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+import concurrent.futures
+import threading
+import random
+import time
+from metadata_store import MetadataStore
+import metrics
+
+# 🔹 Points d'accès de l'API Spotify (surchargeables pour viser un faux serveur local)
+API_URL = "https://api.spotify.com/v1"
+TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+BATCH_SIZE = 50
+
+
+class SpotifyAPIError(Exception):
+    pass
+
+
+# 🔹 Seau à jetons partagé par tous les workers, avec pause globale sur Retry-After
+class RateLimiter:
+    def __init__(self, rate=20.0, burst=20):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.resume_at = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.resume_at:
+                    wait = self.resume_at - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    # 🔹 Un 429 suspend tous les workers, pas seulement celui qui l'a reçu
+    def pause(self, seconds):
+        with self.lock:
+            self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+            self.updated = self.resume_at
+            self.tokens = 0
+
+
+# 🔹 Client HTTP minimal : jeton client credentials, 429 -> pause globale, 5xx -> backoff avec jitter
+class SpotifyAPI:
+    def __init__(self, client_id, client_secret, api_url=API_URL, token_url=TOKEN_URL,
+                 limiter=None, max_retries=5, backoff=0.5, pool_size=16, timeout=10):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.api_url = api_url.rstrip("/")
+        self.token_url = token_url
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        # Connexions keep-alive réutilisées par tous les workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.token = None
+        self.token_expires_at = 0.0
+        self.token_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.calls = 0
+        self.rate_limited = 0
+        self.server_errors = 0
+
+    def _count(self, field):
+        with self.stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _get_token(self):
+        with self.token_lock:
+            if self.token is None or time.monotonic() >= self.token_expires_at:
+                response = self.session.post(self.token_url, data={"grant_type": "client_credentials"},
+                                             auth=(self.client_id or "", self.client_secret or ""),
+                                             timeout=self.timeout)
+                response.raise_for_status()
+                payload = response.json()
+                self.token = payload["access_token"]
+                self.token_expires_at = time.monotonic() + payload.get("expires_in", 3600) - 60
+            return self.token
+
+    def _sleep_backoff(self, attempt):
+        time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    def get(self, path, params=None):
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                response = self.session.get(f"{self.api_url}/{path}", params=params, timeout=self.timeout,
+                                            headers={"Authorization": f"Bearer {self._get_token()}"})
+            except requests.RequestException as e:
+                if attempt >= self.max_retries:
+                    raise SpotifyAPIError(f"{path} : {e}")
+                self._sleep_backoff(attempt)
+                attempt += 1
+                continue
+            self._count("calls")
+            metrics.inc("spotify_api_requests_total", endpoint=path, status=response.status_code)
+
+            if response.status_code == 429:
+                # Comme avant, un 429 n'est jamais abandonné : on attend le délai demandé
+                retry_after = int(response.headers.get("Retry-After", 5))
+                self._count("rate_limited")
+                metrics.inc("spotify_api_rate_limited_total", endpoint=path)
+                print(f"⚠️ Rate limit atteint. Pause globale de {retry_after} secondes...")
+                self.limiter.pause(retry_after)
+                continue
+            if response.status_code == 401:
+                with self.token_lock:
+                    self.token = None
+            if response.status_code == 401 or response.status_code >= 500:
+                if response.status_code >= 500:
+                    self._count("server_errors")
+                if attempt >= self.max_retries:
+                    raise SpotifyAPIError(f"{path} : HTTP {response.status_code}")
+                self._sleep_backoff(attempt)
+                attempt += 1
+                continue
+            if response.status_code >= 400:
+                raise SpotifyAPIError(f"{path} : HTTP {response.status_code}")
+            return response.json()
+
+    def tracks(self, track_ids):
+        return self.get("tracks", {"ids": ",".join(track_ids)})["tracks"]
+
+    def artists(self, artist_ids):
+        return self.get("artists", {"ids": ",".join(artist_ids)})["artists"]
+
+
+def _batches(ids, size=BATCH_SIZE):
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+EMPTY_ARTIST = {"genres": [], "images": [], "followers": {"total": None}}
+
+
+# 🔹 Même format de ligne que l'ancien process_track()
+def build_track_info(track, artist_info):
+    track_image = track["album"]["images"][0]["url"] if track["album"]["images"] else None
+    artist_image = artist_info["images"][0]["url"] if artist_info["images"] else None
+    return {
+        "track_id": track["id"],
+        "popularity": track["popularity"],
+        "duration_ms": track["duration_ms"],
+        "explicit": track["explicit"],
+        "genre": artist_info["genres"][0] if artist_info["genres"] else None,
+        "release_date": track["album"]["release_date"],
+        "track_image": track_image,
+        "artist_image": artist_image,
+        "monthly_listeners": artist_info["followers"]["total"]
+    }
+
+
+def _first_artist_id(track):
+    return track["artists"][0]["id"] if track["artists"] else None
+
+
+# 🔹 Moteur d'enrichissement : morceaux puis artistes par lots de 50, en pipeline.
+#    Les métadonnées encore valides (TTL) sont lues dans le store, les nouvelles y sont écrites par lot.
+class SpotifyEnricher:
+    def __init__(self, api, workers=8, store=None):
+        self.api = api
+        self.workers = workers
+        self.store = store if store is not None else MetadataStore(":memory:")
+
+    def _safe(self, fetch, ids):
+        try:
+            with metrics.timer("spotify_api_batch_seconds", endpoint=fetch.__name__):
+                return fetch(ids)
+        except SpotifyAPIError as e:
+            metrics.inc("spotify_api_errors_total", endpoint=fetch.__name__)
+            print(f"⚠️ Erreur API : {e}")
+            return None
+
+    def enrich(self, track_ids):
+        track_ids = list(dict.fromkeys(track_ids))
+        track_infos = self.store.get_tracks(track_ids)
+        missing = [track_id for track_id in track_ids if track_id not in track_infos]
+        metrics.inc("metadata_cache_requests_total", len(track_infos), cache="tracks", result="hit")
+        metrics.inc("metadata_cache_requests_total", len(missing), cache="tracks", result="miss")
+
+        fetched_tracks = []
+        artists = {}
+        requested_artists = set()
+        artist_buffer = []
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            track_futures = [executor.submit(self._safe, self.api.tracks, batch) for batch in _batches(missing)]
+            # Futur -> identifiants du lot, pour savoir quels artistes n'ont pas pu être lus
+            artist_futures = {}
+
+            # Les lots d'artistes partent dès qu'un lot de morceaux revient, sans attendre les autres
+            for future in tqdm(concurrent.futures.as_completed(track_futures), total=len(track_futures),
+                               desc="🔍 Récupération des morceaux"):
+                tracks = [track for track in future.result() or [] if track]
+                fetched_tracks.extend(tracks)
+
+                artist_ids = {_first_artist_id(track) for track in tracks} - requested_artists - {None}
+                requested_artists |= artist_ids
+                known = self.store.get_artists(artist_ids)
+                artists.update(known)
+                metrics.inc("metadata_cache_requests_total", len(known), cache="artists", result="hit")
+                metrics.inc("metadata_cache_requests_total", len(artist_ids) - len(known), cache="artists", result="miss")
+                artist_buffer.extend(artist_id for artist_id in artist_ids if artist_id not in known)
+
+                while len(artist_buffer) >= BATCH_SIZE:
+                    batch, artist_buffer = artist_buffer[:BATCH_SIZE], artist_buffer[BATCH_SIZE:]
+                    artist_futures[executor.submit(self._safe, self.api.artists, batch)] = batch
+            if artist_buffer:
+                artist_futures[executor.submit(self._safe, self.api.artists, artist_buffer)] = artist_buffer
+
+            fetched_artists = {}
+            failed_artists = set()
+            for future in concurrent.futures.as_completed(artist_futures):
+                result = future.result()
+                if result is None:
+                    failed_artists.update(artist_futures[future])
+                    continue
+                for artist in result:
+                    if artist:
+                        fetched_artists[artist["id"]] = artist
+            artists.update(fetched_artists)
+            self.store.upsert_artists(fetched_artists)
+
+        # Un morceau dont l'artiste n'a pas pu être lu (429 / 5xx persistants) n'est ni stocké ni renvoyé :
+        # le prochain run le redemandera au lieu de garder "sans genre ni followers" jusqu'au TTL
+        new_infos = {}
+        for track in fetched_tracks:
+            artist_id = _first_artist_id(track)
+            if artist_id in failed_artists:
+                continue
+            new_infos[track["id"]] = build_track_info(track, artists.get(artist_id, EMPTY_ARTIST))
+        self.store.upsert_tracks(new_infos)
+        track_infos.update(new_infos)
+
+        return pd.DataFrame([track_infos[track_id] for track_id in track_ids if track_id in track_infos])
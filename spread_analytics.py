@@ -0,0 +1,225 @@
+import argparse
+import threading
+import time
+import numpy as np
+import pandas as pd
+import chart_store
+
+# 🔹 Propagation des morceaux entre pays : première semaine de présence de chaque morceau dans chaque pays
+#    (tableau morceaux x pays), puis matrice pays -> pays agrégée sur tous les morceaux :
+#    combien de morceaux ont classé dans A avant B, et avec combien de semaines d'avance en moyenne.
+
+# Jours depuis l'epoch : écart entre deux semaines = différence / 7
+DAYS_PER_WEEK = 7
+
+
+def _week_days(week_dates):
+    dates = pd.to_datetime(pd.Series(week_dates).astype(str) if isinstance(week_dates.dtype, pd.CategoricalDtype)
+                           else week_dates)
+    return dates.to_numpy().astype("datetime64[D]").astype("int64").astype(float)
+
+
+def first_weeks_of(country, country_data):
+    """Première semaine (jours depuis l'epoch) de chaque morceau dans un pays : Series indexée par track_id"""
+    frame = pd.DataFrame({"track_id": country_data["track_id"].astype(str).to_numpy(),
+                          "day": _week_days(country_data["week_date"])})
+    return frame.groupby("track_id", sort=False)["day"].min().rename(country)
+
+
+def pair_stats(values):
+    """Matrices additives sur les morceaux (lignes de values, NaN = absent du pays) :
+    leads[a, b] = morceaux classés dans a strictement avant b, both[a, b] = morceaux classés dans a et b,
+    lag_sum[a, b] = somme des écarts (jours) de a vers b sur ces morceaux"""
+    n_countries = values.shape[1]
+    leads = np.zeros((n_countries, n_countries), dtype=np.int64)
+    both = np.zeros((n_countries, n_countries), dtype=np.int64)
+    lag_sum = np.zeros((n_countries, n_countries))
+    present = ~np.isnan(values)
+    for a in range(n_countries):
+        # Seuls les morceaux présents dans a comptent pour la ligne a
+        rows = values[present[:, a]]
+        if not len(rows):
+            continue
+        diff = rows - rows[:, [a]]
+        valid = ~np.isnan(diff)
+        both[a] = valid.sum(axis=0)
+        leads[a] = (diff > 0).sum(axis=0)
+        lag_sum[a] = np.where(valid, diff, 0).sum(axis=0)
+    return leads, both, lag_sum
+
+
+class SpreadAnalytics:
+    """Premières semaines par (morceau, pays) et matrice d'avance / retard entre pays.
+
+    Les matrices sont des sommes sur les morceaux : une mise à jour retire la contribution des
+    morceaux modifiés puis ajoute la nouvelle, sans recalculer les autres.
+    """
+
+    def __init__(self, first_weeks):
+        self.lock = threading.Lock()
+        self.first_weeks = first_weeks.sort_index(axis=1)
+        self.countries = list(self.first_weeks.columns)
+        self.leads, self.both, self.lag_sum = pair_stats(self.first_weeks.to_numpy(dtype=float))
+        self.version = 0
+
+    @classmethod
+    def from_charts_frame(cls, charts):
+        """Construit l'analyse à partir des charts combinés (colonnes track_id, country, week_date)"""
+        frame = pd.DataFrame({"track_id": charts["track_id"].astype(str).to_numpy(),
+                              "country": charts["country"].astype(str).to_numpy(),
+                              "day": _week_days(charts["week_date"])})
+        # Pivot vectorisé : minimum par (morceau, pays) puis pays en colonnes
+        first_weeks = frame.pivot_table(index="track_id", columns="country", values="day", aggfunc="min")
+        first_weeks.columns.name = None
+        return cls(first_weeks)
+
+    @classmethod
+    def from_countries(cls, country_frames):
+        """Construit l'analyse à partir de {pays: DataFrame des charts du pays}"""
+        series = [first_weeks_of(country, frame) for country, frame in country_frames.items()]
+        first_weeks = pd.concat(series, axis=1) if series else pd.DataFrame(dtype=float)
+        return cls(first_weeks)
+
+    @classmethod
+    def from_charts(cls, charts_data):
+        """Construit l'analyse à partir de CHARTS_DATA (continent -> pays -> DataFrame)"""
+        return cls.from_countries({
+            country_key: country_data
+            for continent_data in charts_data.values()
+            for country_key, country_data in continent_data.items()
+        })
+
+    @classmethod
+    def from_store(cls):
+        charts = chart_store.load_charts(chart_store.FACTS_DATASET, columns=["country", "track_id", "week_date"])
+        return cls.from_charts_frame(charts)
+
+    def _apply(self, new_rows):
+        """Remplace les premières semaines des morceaux de new_rows (toutes colonnes) et met à jour les matrices"""
+        new_countries = [country for country in new_rows.columns if country not in self.countries]
+        if new_countries:
+            countries = sorted(self.countries + new_countries)
+            positions = [countries.index(country) for country in self.countries]
+            grid = np.ix_(positions, positions)
+            for name in ["leads", "both", "lag_sum"]:
+                matrix = np.zeros((len(countries), len(countries)), dtype=getattr(self, name).dtype)
+                matrix[grid] = getattr(self, name)
+                setattr(self, name, matrix)
+            self.countries = countries
+            self.first_weeks = self.first_weeks.reindex(columns=countries)
+
+        new_rows = new_rows.reindex(columns=self.countries)
+        old_rows = self.first_weeks.reindex(index=new_rows.index)
+        old_values, new_values = old_rows.to_numpy(dtype=float), new_rows.to_numpy(dtype=float)
+        changed = ~((old_values == new_values) | (np.isnan(old_values) & np.isnan(new_values))).all(axis=1)
+        if not changed.any():
+            return 0
+
+        for sign, values in [(-1, old_values[changed]), (1, new_values[changed])]:
+            leads, both, lag_sum = pair_stats(values)
+            self.leads += sign * leads
+            self.both += sign * both
+            self.lag_sum += sign * lag_sum
+
+        updated = new_rows[changed]
+        first_weeks = self.first_weeks.drop(index=updated.index, errors="ignore")
+        # Un morceau absent de tous les pays disparaît de l'analyse
+        updated = updated[updated.notna().any(axis=1)]
+        self.first_weeks = pd.concat([first_weeks, updated])
+        self.version += 1
+        return int(changed.sum())
+
+    def add_weeks(self, charts):
+        """Intègre de nouvelles semaines (colonnes track_id, country, week_date) ; retourne le nombre de morceaux modifiés"""
+        incoming = SpreadAnalytics.from_charts_frame(charts).first_weeks
+        with self.lock:
+            current = self.first_weeks.reindex(index=incoming.index, columns=incoming.columns.union(self.first_weeks.columns))
+            return self._apply(np.fmin(current, incoming.reindex(columns=current.columns)))
+
+    def replace_country(self, country_key, country_data):
+        """Recalcule les premières semaines d'un pays rechargé ; retourne le nombre de morceaux modifiés"""
+        column = first_weeks_of(country_key, country_data)
+        with self.lock:
+            previous = self.first_weeks[country_key].dropna() if country_key in self.first_weeks else column.iloc[:0]
+            tracks = previous.index.union(column.index)
+            rows = self.first_weeks.reindex(index=tracks)
+            rows[country_key] = column.reindex(tracks)
+            return self._apply(rows)
+
+    def matrix(self, min_tracks=1):
+        """Matrices pays x pays : morceaux en commun, part des morceaux arrivés d'abord dans la ligne,
+        avance moyenne (semaines) de la ligne sur la colonne ; None sous min_tracks morceaux en commun"""
+        with self.lock:
+            countries = list(self.countries)
+            leads, both, lag_sum = self.leads.copy(), self.both.copy(), self.lag_sum.copy()
+            tracks = self.first_weeks.notna().sum().reindex(countries).fillna(0).astype(int).tolist()
+            version = self.version
+
+        enough = (both >= max(min_tracks, 1)) & ~np.eye(len(countries), dtype=bool)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            lead_share = np.where(enough, leads / both, np.nan)
+            mean_lag = np.where(enough, lag_sum / both / DAYS_PER_WEEK, np.nan)
+
+        def to_list(matrix, digits):
+            return [[None if np.isnan(value) else round(float(value), digits) for value in row] for row in matrix]
+
+        return {
+            "version": version,
+            "countries": countries,
+            "tracks": tracks,
+            "shared_tracks": both.tolist(),
+            "leads": leads.tolist(),
+            "lead_share": to_list(lead_share, 4),
+            "mean_lag_weeks": to_list(mean_lag, 2),
+        }
+
+    def routes(self, min_tracks=20, limit=20):
+        """Paires (A, B) où les morceaux arrivent le plus souvent dans A avant B"""
+        result = self.matrix(min_tracks)
+        routes = []
+        for a, source in enumerate(result["countries"]):
+            for b, target in enumerate(result["countries"]):
+                share = result["lead_share"][a][b]
+                if share is not None:
+                    routes.append({"from": source, "to": target, "lead_share": share,
+                                   "mean_lag_weeks": result["mean_lag_weeks"][a][b],
+                                   "shared_tracks": result["shared_tracks"][a][b]})
+        routes.sort(key=lambda route: (-route["lead_share"], -route["shared_tracks"]))
+        return routes[:limit]
+
+    def propagation(self, track_id):
+        """[{"country", "week_date", "lag_weeks"}] dans l'ordre d'arrivée du morceau, ou None"""
+        with self.lock:
+            if track_id not in self.first_weeks.index:
+                return None
+            row = self.first_weeks.loc[track_id].dropna()
+        row = row.sort_values(kind="stable")
+        start = row.iloc[0]
+        return [{
+            "country": country,
+            "week_date": str(np.datetime64(int(day), "D")),
+            "lag_weeks": round((day - start) / DAYS_PER_WEEK, 1),
+        } for country, day in row.items()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Propagation des morceaux entre pays")
+    parser.add_argument("--track-id", help="ordre d'arrivée d'un morceau dans les pays")
+    parser.add_argument("--min-tracks", type=int, default=20, help="morceaux en commun minimum pour une paire")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    spread = SpreadAnalytics.from_store()
+    print(f"⏱️ {len(spread.first_weeks)} morceaux x {len(spread.countries)} pays en {time.perf_counter() - start:.2f} s")
+
+    if args.track_id:
+        steps = spread.propagation(args.track_id)
+        if steps is None:
+            print(f"❌ Morceau {args.track_id} introuvable")
+        for step in steps or []:
+            print(f"   {step['week_date']}  {step['country']}  (+{step['lag_weeks']} sem.)")
+    else:
+        for route in spread.routes(args.min_tracks, args.limit):
+            print(f"   {route['from']} -> {route['to']} : {route['lead_share']:.0%} des {route['shared_tracks']} "
+                  f"morceaux en commun, {route['mean_lag_weeks']:+.1f} sem.")
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import chart_store
+
+# 🔹 Colonnes gardées pour chaque point de la trajectoire d'un morceau
+TRAJECTORY_COLUMNS = ["rank", "streams", "weeks_on_chart"]
+
+
+def _country_frame(country, country_data):
+    frame = country_data[["track_id", "week_date"] + TRAJECTORY_COLUMNS].copy()
+    frame["track_id"] = frame["track_id"].astype(str)
+    frame["week_date"] = pd.to_datetime(frame["week_date"]).dt.strftime("%Y-%m-%d")
+    frame["country"] = country
+    return frame
+
+
+class TrajectoryIndex:
+    """Index par morceau : track_id -> tranche de tableaux triés par (pays, semaine).
+
+    Les lignes de tous les pays sont triées une fois par (track_id, pays, semaine) ; une recherche
+    ne lit que la tranche du morceau, son coût est proportionnel au résultat.
+    """
+
+    def __init__(self, frames_by_country):
+        # Lignes de chaque pays gardées à part : un pays rechargé ne refait pas la préparation des autres
+        self.frames_by_country = frames_by_country
+
+        frames = list(frames_by_country.values())
+        if frames:
+            charts = pd.concat(frames, ignore_index=True)
+        else:
+            charts = pd.DataFrame(columns=["track_id", "week_date", "country"] + TRAJECTORY_COLUMNS)
+        charts = charts.sort_values(["track_id", "country", "week_date"], kind="stable", ignore_index=True)
+
+        self.countries = charts["country"].to_numpy()
+        self.weeks = charts["week_date"].to_numpy()
+        self.values = {column: charts[column].to_numpy() for column in TRAJECTORY_COLUMNS}
+
+        track_ids = charts["track_id"].to_numpy()
+        starts = np.flatnonzero(np.r_[True, track_ids[1:] != track_ids[:-1]]) if len(track_ids) else np.array([], int)
+        ends = np.r_[starts[1:], len(track_ids)]
+        self.offsets = dict(zip(track_ids[starts], zip(starts.tolist(), ends.tolist())))
+
+    @classmethod
+    def from_countries(cls, country_frames):
+        """Construit l'index à partir de {pays: DataFrame des charts du pays}"""
+        return cls({country: _country_frame(country, frame) for country, frame in country_frames.items()})
+
+    @classmethod
+    def from_charts(cls, charts_data):
+        """Construit l'index à partir de CHARTS_DATA (continent -> pays -> DataFrame)"""
+        return cls.from_countries({
+            country_key: country_data
+            for continent_data in charts_data.values()
+            for country_key, country_data in continent_data.items()
+        })
+
+    @classmethod
+    def from_store(cls):
+        charts = chart_store.load_charts(chart_store.FACTS_DATASET,
+                                         columns=["country", "track_id", "week_date"] + TRAJECTORY_COLUMNS)
+        return cls.from_countries(dict(tuple(charts.groupby("country", sort=False))))
+
+    def replace_country(self, country_key, country_data):
+        """Nouvel index où seules les lignes de ce pays sont recalculées"""
+        frames_by_country = dict(self.frames_by_country)
+        frames_by_country[country_key] = _country_frame(country_key, country_data)
+        return TrajectoryIndex(frames_by_country)
+
+    def __contains__(self, track_id):
+        return track_id in self.offsets
+
+    def trajectory(self, track_id):
+        """{pays: {"week_date": [...], "rank": [...], "streams": [...], "weeks_on_chart": [...]}} ou None"""
+        if track_id not in self.offsets:
+            return None
+        start, end = self.offsets[track_id]
+        countries = self.countries[start:end]
+
+        result = {}
+        # Les lignes du morceau sont contiguës par pays : découpage aux changements de pays
+        bounds = np.flatnonzero(np.r_[True, countries[1:] != countries[:-1]]).tolist() + [end - start]
+        for left, right in zip(bounds[:-1], bounds[1:]):
+            result[countries[left]] = {
+                "week_date": self.weeks[start + left:start + right].tolist(),
+                **{column: values[start + left:start + right].tolist() for column, values in self.values.items()},
+            }
+        return result